@@ -1,46 +1,122 @@
 from datetime import timedelta
 
-from celery import shared_task
+from celery import chord, group, shared_task
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail, EmailMessage
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.html import strip_tags
 
-from board.models import Post, NewsletterSubscription
+from board.models import Post, Newsletter, NewsletterSubscription
+from board import digests, fanout, newsletters, outbox, reputation
+from board.notifications import purge_read, reconcile_unread
+from board.pagination import pk_ranges
+from board.ranking import decay
 
 User = get_user_model()
 
 
+NEWSLETTER_CHUNK_SIZE = getattr(settings, "NEWSLETTER_CHUNK_SIZE", 500)
+
+
+def newsletter_recipients():
+    return (
+        NewsletterSubscription.objects.filter(subscribed=True, user__is_active=True)
+        .exclude(user__email="")
+        .order_by("pk")
+    )
+
+
+def newsletter_chunks(chunk_size=NEWSLETTER_CHUNK_SIZE):
+    """Границы пачек получателей для send_newsletter_chunk"""
+    return pk_ranges(newsletter_recipients(), chunk_size)
+
+
 @shared_task
 def send_weekly_newsletter():
-    users = (
-        NewsletterSubscription.objects.filter(
-            subscribed=True, user__is_active=True
-        ).values_list("user", flat=True))
-
     last_week = timezone.now() - timedelta(days=7)
-    posts = Post.objects.filter(created_at__gte=last_week)
+    posts = Post.objects.filter(created_at__gte=last_week, published=True).only(
+        "id", "title", "created_at"
+    ).order_by("-created_at")
 
     if not posts.exists():
         return "Нет новых постов для рассылки"
 
+    # дайджест рендерится один раз на всю рассылку
     subject = "Новости MMORPGFAN за неделю"
     html_content = render_to_string("emails/newsletter.html", {"posts": posts})
     plain_text = strip_tags(html_content)
 
-    for user in users:
-        send_mail(
-            subject,
-            plain_text,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            html_message=html_content,
-            fail_silently=False,
-        )
+    chunks = [
+        send_newsletter_chunk.s(subject, plain_text, html_content, first_pk, last_pk)
+        for first_pk, last_pk in newsletter_chunks()
+    ]
+    if not chunks:
+        return "Нет подписчиков для рассылки"
+
+    chord(chunks)(newsletter_report.s())
+    return f"Рассылка запущена: {len(chunks)} пачек"
+
+
+@shared_task(bind=True)
+def send_newsletter_chunk(self, subject, plain_text, html_content, first_pk, last_pk):
+    emails = list(
+        newsletter_recipients().filter(pk__gte=first_pk, pk__lte=last_pk)
+        .values_list("user__email", flat=True)
+    )
+    sent = failed = 0
+    # одно SMTP-соединение на всю пачку
+    with get_connection() as connection:
+        for i, email in enumerate(emails, 1):
+            msg = EmailMultiAlternatives(
+                subject, plain_text, settings.DEFAULT_FROM_EMAIL, [email], connection=connection
+            )
+            msg.attach_alternative(html_content, "text/html")
+            try:
+                sent += msg.send()
+            except Exception:
+                failed += 1
+            if i % 50 == 0:
+                self.update_state(state="PROGRESS", meta={"sent": sent, "failed": failed, "total": len(emails)})
+    return {"sent": sent, "failed": failed}
+
+
+@shared_task
+def newsletter_report(results):
+    sent = sum(r["sent"] for r in results)
+    failed = sum(r["failed"] for r in results)
+    return f"Рассылка отправлена {sent} пользователям, ошибок: {failed}"
+
+
+@shared_task
+def send_newsletter_task(newsletter_id):
+    newsletter = Newsletter.objects.get(pk=newsletter_id)
+    sent, failed, elapsed = newsletters.deliver(newsletter)
+    return f"Рассылка {newsletter_id}: отправлено {sent}, ошибок {failed} за {elapsed:.1f} с"
+
+
+@shared_task
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only("pk", "category_id", "author_id").first()
+    if post is None:
+        return f"Пост {post_id} не найден"
+    chunks = [fan_out_post_chunk.s(post_id, first_pk, last_pk) for first_pk, last_pk in fanout.chunks(post)]
+    if not chunks:
+        return f"Пост {post_id}: нет подписчиков"
+    group(chunks).apply_async()
+    return f"Пост {post_id}: рассылка запущена, {len(chunks)} пачек"
+
+
+@shared_task
+def fan_out_post_chunk(post_id, first_pk, last_pk):
+    sent, failed = fanout.deliver_chunk(post_id, first_pk, last_pk)
+    return {"sent": sent, "failed": failed}
+
 
-    return f"Рассылка отправлена {users.count()} пользователям"
+@shared_task
+def send_notification_digests(mode):
+    return f"Сводки ({mode}): {digests.send(mode)} писем"
 
 
 @shared_task
@@ -51,3 +127,35 @@ def send_test_email():
     email = EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, to=recipient_list)
     email.send(fail_silently=False)
     return f"Письмо отправлено на {recipient_list}"
+
+
+@shared_task
+def decay_post_ranking():
+    return f"Затухание применено к {decay()} постам"
+
+
+@shared_task
+def update_reputation():
+    return f"Репутация обновлена у {reputation.update()} пользователей"
+
+
+@shared_task
+def recompute_reputation():
+    # страховка от дрейфа: правки в админке и удаление пользователей событий не шлют
+    return f"Репутация пересчитана у {reputation.recompute()} пользователей"
+
+
+@shared_task
+def drain_outbox():
+    sent, failed = outbox.drain()
+    return f"Outbox: отправлено {sent}, ошибок {failed}"
+
+
+@shared_task
+def reconcile_unread_notifications():
+    return f"Пересчитаны счётчики {reconcile_unread()} пользователей"
+
+
+@shared_task
+def purge_old_notifications():
+    return f"Удалено прочитанных уведомлений: {purge_read()}"
@@ -1,9 +1,13 @@
 from ckeditor.widgets import CKEditorWidget
 from django import forms
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
 # from modeltranslation.admin import TranslationAdmin
 
-from .models import Category, Post, Reply, Subscription, Newsletter
+from .choices import OUTBOX_PENDING
+from .models import Category, Post, Reply, Subscription, Newsletter, NewsletterDelivery, OutgoingEmail
+from .search import search_post_ids
 
 
 class PostAdminForm(forms.ModelForm):
@@ -18,7 +22,14 @@ class PostAdminForm(forms.ModelForm):
 class PostAdmin(admin.ModelAdmin):
     form = PostAdminForm
     list_display = ("title", "author", "category", "created_at")
-    search_fields = ("title", "body")
+    search_fields = ("title",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # полнотекстовый индекс вместо LIKE по HTML-телу; черновики ищутся по заголовку
+        if not search_term:
+            return queryset, False
+        matches = Q(pk__in=search_post_ids(search_term)) | Q(title__icontains=search_term)
+        return queryset.filter(matches), False
 
 
 @admin.register(Category)
@@ -29,3 +40,22 @@ class CategoryAdmin(admin.ModelAdmin):
 admin.site.register(Reply)
 admin.site.register(Subscription)
 admin.site.register(Newsletter)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("to", "subject", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to",)
+    actions = ["retry"]
+
+    @admin.action(description="Отправить повторно")
+    def retry(self, request, queryset):
+        queryset.update(status=OUTBOX_PENDING, attempts=0, next_attempt_at=timezone.now())
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("newsletter", "email", "status", "attempts", "sent_at")
+    list_filter = ("status", "newsletter")
+    search_fields = ("email",)
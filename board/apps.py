@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class BoardConfig(AppConfig):
@@ -8,4 +9,6 @@ class BoardConfig(AppConfig):
     def ready(self):
         import board.signals
         # import board.translation
+        from board.db import check_replica_schema
+        checks.register(check_replica_schema)
 
@@ -0,0 +1,153 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from django.utils.translation import get_language
+
+from .db import use_primary
+
+PAGE_TTL = getattr(settings, "PAGE_CACHE_TTL", 600)
+
+
+def _generation_key(name):
+    return f"generation:{name}"
+
+
+def generation(*names):
+    """
+    Версия набора поколений для ключа кэша.
+    Вытесненный счётчик заводится заново от текущего времени в нс —
+    старые значения не повторяются, устаревшие записи не оживают.
+    """
+    keys = [_generation_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def bump(*names):
+    """Сдвигает поколения после коммита — до него читатели ещё видят старые данные"""
+    def apply():
+        for name in names:
+            try:
+                cache.incr(_generation_key(name))
+            except ValueError:
+                cache.set(_generation_key(name), time.time_ns(), None)
+    transaction.on_commit(apply)
+
+
+def post_generation(post_id):
+    return f"post:{post_id}"
+
+
+def _page_key(request, version):
+    ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+    raw = f"{request.get_full_path()}|{get_language()}|{int(ajax)}"
+    return f"page:{hashlib.md5(raw.encode()).hexdigest()}:{version}"
+
+
+def cache_anonymous(*generations, timeout=None):
+    """
+    Кэширует ответы анонимам целиком. Ключ: путь с query-строкой (курсор,
+    сортировка), язык, AJAX и версия поколений. generations — имена или
+    функции от kwargs вьюхи.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or request.user.is_authenticated
+                or len(messages.get_messages(request))
+            ):
+                return view(request, *args, **kwargs)
+
+            names = [g(**kwargs) if callable(g) else g for g in generations]
+            key = _page_key(request, generation(*names))
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            # в общий кэш попадает только прочитанное с primary; шаблон рендерится здесь же,
+            # чтобы ленивые queryset'ы тоже выполнились внутри блока
+            with use_primary():
+                response = view(request, *args, **kwargs)
+                if hasattr(response, "render") and not response.is_rendered:
+                    response.render()
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, response, timeout or PAGE_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def post_validators(post_id, **filters):
+    """
+    (версия, Last-Modified) поста: правка поста, последний отклик и принятие.
+    Снятие отклика времени не оставляет — его ловит поколение поста; под ним
+    же результат кэшируется, так что запрос идёт только после изменений.
+    """
+    from .models import Post
+
+    version = generation(post_generation(post_id))
+    # фильтры хэшируются: пробелы и скобки в ключе не переживут memcached
+    filters_hash = hashlib.md5(urlencode(sorted(filters.items())).encode()).hexdigest()
+    key = f"validators:{post_id}:{filters_hash}:{version}"
+    last_modified = cache.get(key)
+    if last_modified is None:
+        with use_primary():
+            row = (
+                Post.objects.filter(pk=post_id, **filters)
+                .values("pk", "updated_at")
+                .annotate(last_reply=Max("replies__created_at"), last_accepted=Max("replies__accepted_at"))
+                .order_by()
+                .first()
+            )
+        if row is None:
+            return None
+        last_modified = max(
+            value for value in (row["updated_at"], row["last_reply"], row["last_accepted"]) if value
+        )
+        cache.set(key, last_modified, PAGE_TTL)
+    return f"{version}:{last_modified.timestamp()}", last_modified
+
+
+def conditional(validators):
+    """
+    Условный GET: validators(request, **kwargs) → (версия, last_modified | None)
+    или None. Совпадение отдаёт 304 до вызова вьюхи — без шаблона и сериализатора.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            found = validators(request, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+
+            version, last_modified = found
+            raw = f"{version}|{get_language()}|{request.headers.get('accept', '')}"
+            etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if last_modified:
+                    response.headers.setdefault("Last-Modified", http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
@@ -9,4 +9,26 @@ CATEGORY_CHOICES = [
     ("Tanner", "Кожевники"),
     ("PotionMaster", "Зельевары"),
     ("Spellmasters", "Мастера заклинаний"),
-]
\ No newline at end of file
+]
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+OUTBOX_STATUS_CHOICES = [
+    (OUTBOX_PENDING, "В очереди"),
+    (OUTBOX_SENDING, "Отправляется"),
+    (OUTBOX_SENT, "Отправлено"),
+    (OUTBOX_FAILED, "Ошибка"),
+]
+
+DIGEST_IMMEDIATE = "immediate"
+DIGEST_HOURLY = "hourly"
+DIGEST_DAILY = "daily"
+
+DIGEST_CHOICES = [
+    (DIGEST_IMMEDIATE, "Сразу"),
+    (DIGEST_HOURLY, "Сводка раз в час"),
+    (DIGEST_DAILY, "Сводка раз в день"),
+]
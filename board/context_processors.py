@@ -1,4 +1,7 @@
+from .notifications import unread_count
+
+
 def unread_notifications_count(request):
     if request.user.is_authenticated:
-        return {"unread_notifications": request.user.notifications.filter(read=False).count()}
+        return {"unread_notifications": unread_count(request.user.pk)}
     return {"unread_notifications": 0}
@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.db import connections
+
+REPLICA = "replica"
+STICKY_COOKIE = "db_primary"
+STICKY_SECONDS = getattr(settings, "DB_REPLICA_STICKY_SECONDS", 15)
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# состояние текущего запроса: можно ли читать с реплики и была ли запись
+_state = ContextVar("db_state", default=None)
+
+
+def has_replica():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_primary():
+    """
+    Чтения внутри блока идут на primary. Нужно там, где результат уходит
+    в общий кэш: отставшая реплика закэшировала бы устаревшие данные.
+    """
+    state = _state.get()
+    if not state:
+        yield
+        return
+    replica, state["replica"] = state["replica"], False
+    try:
+        yield
+    finally:
+        state["replica"] = replica and not state["wrote"]
+
+
+class ReplicaRouter:
+    """
+    Чтения безопасных запросов идут на реплику (решает ReplicaMiddleware),
+    всё остальное — записи, Celery, команды, транзакции — на primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if not state or not state["replica"] or not has_replica():
+            return "default"
+        # внутри транзакции читаем то же, что пишем
+        if connections["default"].in_atomic_block:
+            return "default"
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state:
+            # после записи запрос и следующие запросы пользователя читают с primary
+            state["replica"], state["wrote"] = False, True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика — копия primary, связи между ними допустимы
+        if {obj1._state.db, obj2._state.db} <= {"default", REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплика получает с primary: репликацией, а SQLite-файл — копированием
+        # (сторонние миграции с RunPython читают через роутер и на реплике не применяются)
+        return db == "default"
+
+
+def check_replica_schema(app_configs=None, **kwargs):
+    """SQLite-реплика — копия файла primary; без неё каждое чтение падает с "no such table" """
+    if not has_replica() or connections[REPLICA].vendor != "sqlite":
+        return []
+    if connections[REPLICA].settings_dict["NAME"] == connections["default"].settings_dict["NAME"]:
+        return []
+    if "django_migrations" in connections[REPLICA].introspection.table_names():
+        return []
+    return [checks.Warning(
+        "SQLite replica has no schema",
+        hint='Copy the primary database: cp db.sqlite3 "$DB_REPLICA_NAME"',
+        id="board.W001",
+    )]
+
+
+class ReplicaMiddleware:
+    """
+    GET/HEAD/OPTIONS читают с реплики. После записи ставится cookie,
+    и STICKY_SECONDS пользователь читает с primary — видит свои изменения,
+    пока реплика догоняет. Работает и под ASGI без перехода в поток,
+    так что асинхронные вьюхи (SSE-поток уведомлений) остаются асинхронными.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(state, response)
+
+    def _begin(self, request):
+        state = {
+            "replica": request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES,
+            "wrote": False,
+        }
+        return state, _state.set(state)
+
+    def _finish(self, state, response):
+        if state["wrote"] and has_replica():
+            response.set_cookie(STICKY_COOKIE, "1", max_age=STICKY_SECONDS, httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import outbox
+from .models import NewsletterSubscription, Notification
+
+BATCH_SIZE = getattr(settings, "DIGEST_BATCH_SIZE", 200)
+# в письмо попадают самые свежие события, остальное — ссылкой на страницу уведомлений
+MAX_ITEMS = getattr(settings, "DIGEST_MAX_ITEMS", 20)
+
+
+def _render(items, total):
+    subject = f"MMORPG Fanboard: {total} новых событий"
+    context = {"items": items, "more": total - len(items), "total": total, "site": settings.SITE_URL}
+    html = render_to_string("emails/notification_digest.html", context)
+    lines = [f"- {message}" + (f" {settings.SITE_URL}{url}" if url else "") for message, url in items]
+    if total > len(items):
+        lines.append(f"…и ещё {total - len(items)}: {settings.SITE_URL}/notifications/")
+    return subject, "\n".join(lines), html
+
+
+def send(mode, now=None, batch_size=BATCH_SIZE):
+    """
+    Собирает неотправленные письмом уведомления пользователей с режимом mode
+    в одно письмо на пользователя. Письма пачки пишутся в outbox одним INSERT,
+    уведомления помечаются в той же транзакции. Возвращает число писем.
+    """
+    now = now or timezone.now()
+    users = (
+        NewsletterSubscription.objects.filter(digest=mode, user__is_active=True)
+        .order_by("user_id").values_list("user_id", "user__email")
+    )
+    total = 0
+    last_user_id = 0
+    while True:
+        batch = dict(users.filter(user_id__gt=last_user_id)[:batch_size])
+        if not batch:
+            break
+        last_user_id = max(batch)
+        pending = Notification.objects.filter(user_id__in=list(batch), emailed_at__isnull=True, created_at__lte=now)
+
+        items, counts = defaultdict(list), defaultdict(int)
+        for user_id, message, url in pending.order_by("user_id", "-created_at").values_list("user_id", "message", "url"):
+            counts[user_id] += 1
+            if len(items[user_id]) < MAX_ITEMS:
+                items[user_id].append((message, url))
+
+        messages = []
+        for user_id, count in counts.items():
+            if batch[user_id]:
+                subject, text, html = _render(items[user_id], count)
+                messages.append((subject, text, batch[user_id], html))
+        with transaction.atomic():
+            outbox.enqueue_many(messages)
+            # пользователи без адреса тоже помечаются — иначе события копились бы вечно
+            pending.update(emailed_at=now)
+        total += len(messages)
+    return total
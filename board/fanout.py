@@ -0,0 +1,85 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import outbox
+from .choices import DIGEST_IMMEDIATE
+from .models import Notification, Post, Subscription
+from .notifications import notify_many
+from .pagination import pk_ranges
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "FANOUT_CHUNK_SIZE", 500)
+
+
+def schedule(post_id):
+    """Рассылка о новом посте стартует после коммита — запрос автора подписчиков не ждёт"""
+    transaction.on_commit(lambda: _dispatch(post_id))
+
+
+def _dispatch(post_id):
+    from appointment.tasks import fan_out_post
+    try:
+        # как board.outbox.schedule_drain: недоступный брокер не держит запрос автора
+        fan_out_post.apply_async((post_id,), retry=False, ignore_result=True)
+    except Exception:
+        logger.warning("Could not schedule fan-out for post %s", post_id, exc_info=True)
+
+
+def subscriptions(post):
+    # автору о собственном посте не пишем
+    return (
+        Subscription.objects.filter(category_id=post.category_id, user__is_active=True)
+        .exclude(user_id=post.author_id)
+        .order_by("pk")
+    )
+
+
+def chunks(post, chunk_size=CHUNK_SIZE):
+    """Границы пачек подписок для fan_out_post_chunk"""
+    return pk_ranges(subscriptions(post), chunk_size)
+
+
+def deliver_chunk(post_id, first_pk, last_pk):
+    """
+    Одна пачка подписчиков: уведомления одним INSERT, письма —
+    по одному на адрес через общее SMTP-соединение. Возвращает (отправлено, ошибок).
+    """
+    post = Post.objects.select_related("category").filter(pk=post_id).first()
+    if post is None:
+        return 0, 0
+    recipients = list(
+        subscriptions(post).filter(pk__gte=first_pk, pk__lte=last_pk)
+        .values_list("user_id", "user__email", "user__newsletter_subscription__digest")
+    )
+    if not recipients:
+        return 0, 0
+
+    url = f"/posts/{post.pk}/"
+    now = timezone.now()
+    # подписчики со сводкой получат пост в дайджесте (board.digests)
+    immediate = {user_id for user_id, _, digest in recipients if digest in (None, DIGEST_IMMEDIATE)}
+    with transaction.atomic():
+        notify_many([
+            Notification(
+                user_id=user_id,
+                message=f"Новый пост в категории '{post.category.title}': {post.title}",
+                url=url,
+                emailed_at=now if user_id in immediate else None,
+            )
+            for user_id, _, _ in recipients
+        ])
+
+    subject = f"Новая публикация в вашей категории: {post.title}"
+    excerpt = post.excerpt()
+    html = render_to_string("emails/new_post_newsletter.html", {
+        "post": post,
+        "excerpt": excerpt,
+        "site": settings.SITE_URL,
+    })
+    text = f"{post.title}\n\n{excerpt}\n{settings.SITE_URL}{url}"
+    return outbox.send_now(subject, text, [email for user_id, email, _ in recipients if user_id in immediate], html=html)
@@ -1,5 +1,8 @@
+from datetime import datetime, time, timedelta
+
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 from django import forms
+from django.utils import timezone
 
 from .models import Post, Reply, Category
 
@@ -33,3 +36,47 @@ class ReplyForm(forms.ModelForm):
         widgets = {
             "text": forms.Textarea(attrs={"class": "form-control", "rows": 3, "placeholder": "Напишите отклик…"}),
         }
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ReplyFilterForm(forms.Form):
+    """Фильтры входящих откликов (страница «Мои отклики»)"""
+    ACCEPTED_CHOICES = [("", "Все"), ("1", "Принятые"), ("0", "Непринятые")]
+    ORDER_CHOICES = [("desc", "desc"), ("asc", "asc")]
+
+    post = forms.IntegerField(required=False, min_value=1, widget=forms.HiddenInput)
+    accepted = forms.ChoiceField(
+        choices=ACCEPTED_CHOICES, required=False, label="Статус",
+        widget=forms.Select(attrs={"class": "form-select w-auto"}),
+    )
+    date_from = forms.DateField(
+        required=False, label="С", widget=forms.DateInput(attrs={"type": "date", "class": "form-control w-auto"}),
+    )
+    date_to = forms.DateField(
+        required=False, label="По", widget=forms.DateInput(attrs={"type": "date", "class": "form-control w-auto"}),
+    )
+    order = forms.ChoiceField(choices=ORDER_CHOICES, required=False, widget=forms.HiddenInput)
+
+    def filter(self, replies):
+        """Применяет валидные фильтры; невалидные поля просто игнорируются"""
+        self.is_valid()
+        data = self.cleaned_data
+        if data.get("post"):
+            replies = replies.filter(post_id=data["post"])
+        if data.get("accepted"):
+            replies = replies.filter(accepted=data["accepted"] == "1")
+        # границы дней переводятся в моменты времени, чтобы работал индекс по created_at
+        if data.get("date_from"):
+            replies = replies.filter(created_at__gte=_day_start(data["date_from"]))
+        if data.get("date_to"):
+            replies = replies.filter(created_at__lt=_day_start(data["date_to"] + timedelta(days=1)))
+        return replies
+
+
+class NotificationMarkReadForm(forms.Form):
+    """Массовая отметка уведомлений прочитанными; ids разбирает сама вьюха"""
+    all = forms.BooleanField(required=False)
+    before = forms.DateTimeField(required=False)
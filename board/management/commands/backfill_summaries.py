@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from board.models import Post, PostSummary
+
+SUMMARY_FIELDS = [
+    "title", "excerpt", "author", "author_username",
+    "category", "category_title", "created_at", "published",
+]
+
+
+class Command(BaseCommand):
+    help = "Rebuild PostSummary projections for all posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        posts = Post.objects.select_related("author", "category").order_by("pk")
+
+        batch, total = [], 0
+        for post in posts.iterator(chunk_size=batch_size):
+            batch.append(PostSummary.build(post))
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+                batch = []
+        if batch:
+            total += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} post summaries"))
+
+    def _flush(self, batch):
+        PostSummary.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["post"],
+            update_fields=SUMMARY_FIELDS,
+        )
+        return len(batch)
@@ -0,0 +1,165 @@
+import json
+import random
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from board.models import Post, PostRank
+
+User = get_user_model()
+
+
+def percentile(values, p):
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(1, round(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p95 latency and query counts of the main pages and API endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON results")
+        parser.add_argument("--label", default="", help="Name of the run, defaults to the git revision")
+        parser.add_argument("--compare", help="Previous results JSON to print the difference against")
+        parser.add_argument("--only", nargs="*", default=(), help="Run only these scenarios")
+        parser.add_argument("--clear-cache", action="store_true", help="Clear the cache before every request")
+        parser.add_argument("--host", default="", help="Host header, defaults to the first ALLOWED_HOSTS entry")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for picking posts and users")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        host = options["host"] or next((h for h in settings.ALLOWED_HOSTS if h and h != "*"), "localhost")
+        scenarios = self.scenarios()
+        if options["only"]:
+            unknown = set(options["only"]) - {name for name, *_ in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = [s for s in scenarios if s[0] in options["only"]]
+
+        results = {}
+        for name, user, urls in scenarios:
+            client = Client(HTTP_HOST=host)
+            if user is not None:
+                client.force_login(user)
+            results[name] = self.measure(client, urls, options["iterations"], options["warmup"], options["clear_cache"])
+            self.stdout.write(self.format_row(name, results[name]))
+
+        report = {
+            "label": options["label"] or git_revision(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "iterations": options["iterations"],
+            "clear_cache": options["clear_cache"],
+            "scenarios": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Saved {options['output']}"))
+
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text(encoding="utf-8")), report)
+
+    def scenarios(self):
+        """(имя, пользователь или None, список URL) — URL перебираются по кругу"""
+        post_ids = list(
+            Post.objects.filter(published=True).order_by("-reply_count").values_list("pk", flat=True)[:200]
+        )
+        if not post_ids:
+            raise CommandError("No published posts, run seed_board first")
+        self.rng.shuffle(post_ids)
+        post_ids = post_ids[:20]
+        # владельцы самых обсуждаемых постов: у них самый тяжёлый «Мои отклики»
+        owner = User.objects.annotate(n=Count("posts__replies")).order_by("-n").first()
+        authors = list(
+            User.objects.annotate(n=Count("posts")).filter(n__gt=0).order_by("-n").values_list("pk", flat=True)[:20]
+        )
+        category_id = PostRank.objects.values_list("category_id", flat=True).first()
+
+        return [
+            ("index", None, ["/"]),
+            ("post_list", None, ["/posts/"]),
+            ("post_detail", None, [f"/posts/{pk}/" for pk in post_ids]),
+            ("post_detail_owner", owner, [f"/posts/{owner.posts.order_by('-reply_count').first().pk}/"]),
+            ("post_replies", None, [f"/posts/{pk}/replies/" for pk in post_ids]),
+            ("post_ranking", None, ["/ranking/", "/ranking/?sort=top", f"/ranking/?category={category_id}"]),
+            ("my_replies", owner, ["/my-replies/", "/my-replies/?order=asc", "/my-replies/?accepted=0"]),
+            ("author_card", None, [f"/auth/profile/{pk}/" for pk in authors]),
+            ("api_posts", None, ["/api/posts/"]),
+            ("api_post_detail", None, [f"/api/posts/{pk}/" for pk in post_ids]),
+            ("api_replies", None, ["/api/replies/"]),
+            ("api_ranking", None, ["/api/ranking/"]),
+            ("api_notifications", owner, ["/api/notifications/"]),
+        ]
+
+    def measure(self, client, urls, iterations, warmup, clear_cache):
+        for i in range(warmup):
+            client.get(urls[i % len(urls)])
+
+        timings, queries, statuses = [], [], set()
+        for i in range(iterations):
+            if clear_cache:
+                cache.clear()
+            url = urls[i % len(urls)]
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url)
+                # потоковый ответ тоже считается целиком
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(ctx.captured_queries))
+            statuses.add(response.status_code)
+
+        return {
+            "urls": urls,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "mean_ms": round(sum(timings) / len(timings), 2),
+            "max_ms": round(max(timings), 2),
+            "queries_p50": percentile(queries, 50),
+            "queries_max": max(queries),
+            "statuses": sorted(statuses),
+        }
+
+    def format_row(self, name, result):
+        row = (
+            f"{name:<20} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"queries {result['queries_p50']}/{result['queries_max']}"
+        )
+        if result["statuses"] != [200]:
+            return self.style.WARNING(f"{row}  statuses {result['statuses']}")
+        return row
+
+    def compare(self, before, after):
+        self.stdout.write(f"\n{before.get('label') or '?'} → {after['label'] or '?'}")
+        for name, result in after["scenarios"].items():
+            old = before.get("scenarios", {}).get(name)
+            if not old:
+                continue
+            self.stdout.write(
+                f"{name:<20} p50 {result['p50_ms'] - old['p50_ms']:>+8.2f} ms  "
+                f"p95 {result['p95_ms'] - old['p95_ms']:>+8.2f} ms  "
+                f"queries {result['queries_p50'] - old['queries_p50']:>+d}"
+            )
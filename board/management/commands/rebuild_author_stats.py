@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from board import stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild AuthorStats rows from posts and replies"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = stats.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {total} authors"))
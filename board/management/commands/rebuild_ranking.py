@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from board import ranking
+from board.models import PostRank
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post ranking leaderboard from posts and replies"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ranking.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {PostRank.objects.count()} posts"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from board.models import Post
+from board.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for published posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        total = 0
+        with transaction.atomic():
+            backend.clear()
+            posts = Post.objects.filter(published=True).order_by("pk")
+            for post in posts.iterator(chunk_size=options["batch_size"]):
+                backend.index_post(post)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} posts"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from board import reputation
+
+
+class Command(BaseCommand):
+    help = "Recompute Author.reputation from the whole reply history"
+
+    def handle(self, *args, **options):
+        total = reputation.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed reputation for {total} users"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from board.models import Post
+
+
+def actual_counters(posts):
+    """Фактические значения счётчиков, посчитанные по таблице откликов"""
+    return posts.annotate(
+        actual_replies=Count("replies"),
+        actual_live=Count("replies", filter=Q(replies__deleted=False)),
+        actual_accepted=Count("replies", filter=Q(replies__deleted=False, replies__accepted=True)),
+    )
+
+
+class Command(BaseCommand):
+    help = "Recompute Post reply counters and repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk, checked, repaired = 0, 0, 0
+
+        while True:
+            batch = list(actual_counters(
+                Post.objects.filter(pk__gt=last_pk).order_by("pk")
+                .only("id", "reply_count", "live_reply_count", "accepted_count")
+            )[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            checked += len(batch)
+
+            drifted = []
+            for post in batch:
+                actual = (post.actual_replies, post.actual_live, post.actual_accepted)
+                if actual != (post.reply_count, post.live_reply_count, post.accepted_count):
+                    post.reply_count, post.live_reply_count, post.accepted_count = actual
+                    drifted.append(post)
+            if drifted:
+                Post.objects.bulk_update(drifted, Post.COUNTER_FIELDS)
+                repaired += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} posts, repaired {repaired}"))
@@ -0,0 +1,201 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from board.choices import CATEGORY_CHOICES, DIGEST_CHOICES
+from board.models import Category, NewsletterSubscription, Notification, Post, Reply, Subscription
+
+User = get_user_model()
+
+WORDS = (
+    "рейд подземелье гильдия танк хил урон пати квест награда босс лут броня меч посох зелье "
+    "кузнец ремесло аукцион золото уровень навык заклинание агро таунт баф дебаф кулдаун "
+    "локация фарм данж героик трай вайп тактика билд шмот сет ролл ключ неделя вечер онлайн"
+).split()
+ROLES = ("Ищу", "Нужен", "Требуется", "Возьмём", "Собираем")
+
+# команды, которые достраивают всё, что обычно поддерживают сигналы (bulk_create их не шлёт)
+DERIVED_COMMANDS = (
+    "recount",
+    "backfill_summaries",
+    "rebuild_search_index",
+    "rebuild_ranking",
+    "rebuild_author_stats",
+    "recompute_reputation",
+)
+
+
+def sentence(rng, words=(6, 14)):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(*words)))
+    return text.capitalize() + "."
+
+
+def rich_body(rng):
+    """HTML как из CKEditor: абзацы, выделение, список, иногда ссылка"""
+    parts = [f"<p>{' '.join(sentence(rng) for _ in range(rng.randint(2, 5)))}</p>" for _ in range(rng.randint(1, 4))]
+    if rng.random() < 0.6:
+        items = "".join(f"<li>{sentence(rng, (2, 5))}</li>" for _ in range(rng.randint(2, 6)))
+        parts.insert(rng.randint(0, len(parts)), f"<ul>{items}</ul>")
+    if rng.random() < 0.4:
+        parts.append(f"<p><strong>{sentence(rng, (3, 6))}</strong></p>")
+    if rng.random() < 0.2:
+        parts.append('<p><a href="https://example.com/guide">Гайд по тактике</a></p>')
+    return "\n".join(parts)
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, posts, replies, subscriptions and notifications for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=5000)
+        parser.add_argument("--replies-per-post", type=int, default=8, help="Average, actual count is random")
+        parser.add_argument("--subscriptions-per-user", type=int, default=2)
+        parser.add_argument("--notifications-per-user", type=int, default=10)
+        parser.add_argument("--days", type=int, default=180, help="Spread created_at over this many days")
+        parser.add_argument("--password", default="benchmark", help="Password of every generated user")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed: same seed, same data")
+        parser.add_argument("--skip-derived", action="store_true", help="Do not rebuild summaries, ranking, stats…")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.since = self.now - timedelta(days=options["days"])
+
+        categories = self.categories()
+        user_ids = self.users(options["users"], options["password"])
+        self.stdout.write(f"Users: {len(user_ids)}")
+        self.subscriptions(user_ids, categories, options["subscriptions_per_user"])
+        posts, replies = self.posts(user_ids, categories, options["posts"], options["replies_per_post"])
+        self.stdout.write(f"Posts: {posts}, replies: {replies}")
+        notifications = self.notifications(user_ids, options["notifications_per_user"])
+        self.stdout.write(f"Notifications: {notifications}")
+
+        if not options["skip_derived"]:
+            for name in DERIVED_COMMANDS:
+                call_command(name, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Seeding finished"))
+
+    def moment(self, after=None):
+        start = max(after or self.since, self.since)
+        return start + (self.now - start) * self.rng.random()
+
+    def categories(self):
+        for code, title in CATEGORY_CHOICES:
+            Category.objects.get_or_create(code=code, defaults={"title": title})
+        return dict(Category.objects.values_list("pk", "title"))
+
+    def users(self, count, password):
+        # хэш считается один раз: PBKDF2 на каждого пользователя занял бы часы
+        password = make_password(password)
+        offset = User.objects.aggregate(last=Max("pk"))["last"] or 0
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            batch = [
+                User(
+                    username=f"user{offset + i}",
+                    email=f"user{offset + i}@example.com" if self.rng.random() < 0.9 else "",
+                    password=password,
+                    date_joined=self.moment(),
+                )
+                for i in range(start + 1, min(start + self.batch_size, count) + 1)
+            ]
+            user_ids += [user.pk for user in User.objects.bulk_create(batch)]
+
+        digests = [choice for choice, _ in DIGEST_CHOICES]
+        self.bulk(NewsletterSubscription, (
+            NewsletterSubscription(
+                user_id=user_id,
+                subscribed=self.rng.random() < 0.5,
+                digest=self.rng.choices(digests, weights=(8, 1, 1))[0],
+            )
+            for user_id in user_ids if self.rng.random() < 0.3
+        ))
+        return user_ids
+
+    def subscriptions(self, user_ids, categories, per_user):
+        category_ids = list(categories)
+        self.bulk(Subscription, (
+            Subscription(user_id=user_id, category_id=category_id)
+            for user_id in user_ids
+            for category_id in self.rng.sample(category_ids, min(self.rng.randint(0, per_user * 2), len(category_ids)))
+        ))
+
+    def posts(self, user_ids, categories, count, replies_per_post):
+        category_ids = list(categories)
+        # активность авторов неравномерна: немногие пишут большую часть постов
+        weights = [1 / (rank + 1) for rank in range(len(user_ids))]
+        total_posts = total_replies = 0
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            authors = self.rng.choices(user_ids, weights=weights, k=size)
+            batch = []
+            for author_id in authors:
+                category_id = self.rng.choice(category_ids)
+                title = f"{self.rng.choice(ROLES)} {categories[category_id].lower()}: {sentence(self.rng, (2, 6))}"
+                batch.append(Post(
+                    author_id=author_id,
+                    category_id=category_id,
+                    title=title[:255],
+                    body=rich_body(self.rng),
+                    created_at=self.moment(),
+                    published=self.rng.random() < 0.95,
+                ))
+            with transaction.atomic():
+                posts = Post.objects.bulk_create(batch)
+                total_replies += self.replies(posts, user_ids, replies_per_post)
+            total_posts += len(posts)
+        return total_posts, total_replies
+
+    def replies(self, posts, user_ids, per_post):
+        def generate():
+            for post in posts:
+                for _ in range(int(self.rng.expovariate(1 / per_post)) if per_post else 0):
+                    created_at = self.moment(after=post.created_at)
+                    accepted = self.rng.random() < 0.15
+                    yield Reply(
+                        post_id=post.pk,
+                        author_id=self.rng.choice(user_ids),
+                        text=sentence(self.rng, (4, 30)),
+                        created_at=created_at,
+                        accepted=accepted,
+                        accepted_at=self.moment(after=created_at) if accepted else None,
+                        deleted=self.rng.random() < 0.05,
+                    )
+        return self.bulk(Reply, generate())
+
+    def notifications(self, user_ids, per_user):
+        # created_at — auto_now_add, поэтому все уведомления получают время запуска
+        def generate():
+            for user_id in user_ids:
+                for _ in range(self.rng.randint(0, per_user * 2)):
+                    yield Notification(
+                        user_id=user_id,
+                        message=f"Новый отклик на '{sentence(self.rng, (2, 5))}'",
+                        url="/notifications/",
+                        read=self.rng.random() < 0.7,
+                        emailed_at=self.now,
+                    )
+        return self.bulk(Notification, generate())
+
+    def bulk(self, model, objects):
+        batch, total = [], 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        return total
@@ -1,23 +1,39 @@
-from django.conf import settings
-from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives
 from django.core.management.base import BaseCommand
-from django.template.loader import render_to_string
 
 from board.models import Newsletter
+from board.newsletters import BATCH_SIZE, deliver
 
 
 class Command(BaseCommand):
-    help = "Send unsent newsletters"
+    help = "Send unsent newsletters (resumable: already delivered recipients are skipped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--newsletter", type=int, help="Send only this newsletter id")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--resend-unconfirmed", action="store_true",
+            help="Retry recipients left in 'sending' by an interrupted run (may duplicate)",
+        )
 
     def handle(self, *args, **options):
         items = Newsletter.objects.filter(sent=False)
+        if options["newsletter"]:
+            items = items.filter(pk=options["newsletter"])
+
         for n in items:
-            recipients = [u.email for u in User.objects.filter(is_active=True).exclude(email='')]
-            html = render_to_string("emails/newsletter.html", {"body": n.body, "subject": n.subject})
-            msg = EmailMultiAlternatives(n.subject, n.body, settings.DEFAULT_FROM_EMAIL, recipients)
-            msg.attach_alternative(html, "text/html")
-            msg.send()
-            n.sent = True
-            n.save()
-            self.stdout.write(self.style.SUCCESS(f"Sent newsletter {n.id} to {len(recipients)}"))
+            def progress(sent, failed, elapsed):
+                rate = sent / elapsed if elapsed else 0
+                self.stdout.write(f"Newsletter {n.id}: sent {sent}, failed {failed}, {rate:.1f} msg/s")
+
+            sent, failed, elapsed = deliver(
+                n,
+                batch_size=options["batch_size"],
+                resend_unconfirmed=options["resend_unconfirmed"],
+                progress=progress,
+            )
+            n.refresh_from_db(fields=["sent"])
+            style = self.style.SUCCESS if n.sent else self.style.WARNING
+            self.stdout.write(style(
+                f"Newsletter {n.id}: sent {sent}, failed {failed} in {elapsed:.1f}s"
+                f"{'' if n.sent else ' (incomplete, rerun to resume)'}"
+            ))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:48
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_summaries(apps, schema_editor):
+    # то же, что PostSummary.build; excerpt повторяет Post.excerpt — методов у исторических моделей нет
+    Post = apps.get_model("board", "Post")
+    PostSummary = apps.get_model("board", "PostSummary")
+    posts = Post.objects.select_related("author", "category").order_by("pk")
+    batch = []
+    for post in posts.iterator(chunk_size=1000):
+        text = re.sub('<[^<]+?>', '', post.body)
+        batch.append(PostSummary(
+            post_id=post.pk,
+            title=post.title,
+            excerpt=(text[:200] + '...') if len(text) > 200 else text,
+            author_id=post.author_id,
+            author_username=post.author.username,
+            category_id=post.category_id,
+            category_title=post.category.title,
+            created_at=post.created_at,
+            published=post.published,
+        ))
+        if len(batch) >= 1000:
+            PostSummary.objects.bulk_create(batch)
+            batch = []
+    PostSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0005_newslettersubscription'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSummary',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='board.post')),
+                ('title', models.CharField(max_length=255)),
+                ('excerpt', models.TextField(blank=True)),
+                ('author_username', models.CharField(max_length=150)),
+                ('category_title', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('published', models.BooleanField(default=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='board.category')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('published', True)), fields=['-created_at', '-post'], name='postsummary_pub_feed_idx')],
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# копия схемы индекса board.search на момент миграции: миграция не должна меняться вместе с модулем
+ROWID_STRIDE = 8
+LANGUAGE_SLOTS = {"": 0, **{code: i + 1 for i, (code, _) in enumerate(settings.LANGUAGES)}}
+SEARCH_CONFIGS = getattr(settings, "SEARCH_CONFIGS", {"ru": "russian", "en": "english", "": "simple"})
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS board_post_fts USING fts5("
+    "title, body, lang UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+)
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS board_post_search ("
+    "post_id bigint NOT NULL REFERENCES board_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "lang varchar(8) NOT NULL, "
+    "document tsvector NOT NULL, "
+    "PRIMARY KEY (post_id, lang))",
+    "CREATE INDEX IF NOT EXISTS board_post_search_document_idx ON board_post_search USING GIN (document)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == "postgresql":
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+
+
+def post_documents(post):
+    if not hasattr(post, f"title_{settings.LANGUAGE_CODE}"):
+        return [("", post.title, strip_tags(post.body))]
+    docs = []
+    for code, _ in settings.LANGUAGES:
+        title = getattr(post, f"title_{code}", None) or post.title
+        body = getattr(post, f"body_{code}", None) or post.body
+        docs.append((code, title, strip_tags(body)))
+    return docs
+
+
+def fill_search_index(apps, schema_editor):
+    # то же, что rebuild_search_index, по исторической модели
+    vendor = schema_editor.connection.vendor
+    if vendor not in ("sqlite", "postgresql"):
+        return
+    Post = apps.get_model("board", "Post")
+    with schema_editor.connection.cursor() as cursor:
+        for post in Post.objects.filter(published=True).order_by("pk").iterator(chunk_size=500):
+            for lang, title, body in post_documents(post):
+                if vendor == "sqlite":
+                    cursor.execute(
+                        "INSERT INTO board_post_fts (rowid, title, body, lang) VALUES (%s, %s, %s, %s)",
+                        [post.pk * ROWID_STRIDE + LANGUAGE_SLOTS.get(lang, 0), title, body, lang],
+                    )
+                else:
+                    config = SEARCH_CONFIGS.get(lang, "simple")
+                    cursor.execute(
+                        "INSERT INTO board_post_search (post_id, lang, document) VALUES (%s, %s, "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'B'))",
+                        [post.pk, lang, config, title, config, body],
+                    )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS board_post_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS board_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0006_postsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
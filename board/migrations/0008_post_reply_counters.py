@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model("board", "Post")
+    Reply = apps.get_model("board", "Reply")
+
+    def counted(**filters):
+        replies = (
+            Reply.objects.filter(post=OuterRef("pk"), **filters)
+            .order_by().values("post").annotate(total=Count("pk")).values("total")
+        )
+        return Coalesce(Subquery(replies, output_field=IntegerField()), Value(0))
+
+    Post.objects.update(
+        reply_count=counted(),
+        live_reply_count=counted(deleted=False),
+        accepted_count=counted(deleted=False, accepted=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0007_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='accepted_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='live_reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:52
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# веса и затухание board.ranking на момент миграции: миграция не должна меняться вместе с модулем
+RANKING = {
+    "post_weight": 1.0,
+    "reply_weight": 1.0,
+    "accept_weight": 3.0,
+    "half_life_hours": 24.0,
+    **getattr(settings, "RANKING", {}),
+}
+HOT_EPSILON = 1e-3
+
+
+def decay_factor(hours):
+    return 0.5 ** (hours / RANKING["half_life_hours"])
+
+
+def fill_ranking(apps, schema_editor):
+    # то же, что board.ranking.rebuild, но на исторических моделях
+    Post = apps.get_model("board", "Post")
+    PostRank = apps.get_model("board", "PostRank")
+    Reply = apps.get_model("board", "Reply")
+    now = timezone.now()
+
+    hot = defaultdict(float)
+    horizon = now - timedelta(hours=RANKING["half_life_hours"] * 10)
+    recent = Reply.objects.filter(created_at__gte=horizon, deleted=False).values_list("post_id", "created_at", "accepted")
+    for post_id, created_at, accepted in recent.iterator(chunk_size=1000):
+        weight = RANKING["reply_weight"] + (RANKING["accept_weight"] if accepted else 0)
+        hot[post_id] += weight * decay_factor((now - created_at).total_seconds() / 3600)
+
+    posts = Post.objects.values_list(
+        "pk", "title", "category_id", "published", "created_at", "live_reply_count", "accepted_count"
+    ).order_by("pk")
+    batch = []
+    for pk, title, category_id, published, created_at, live, accepted in posts.iterator(chunk_size=1000):
+        hot_score = hot[pk] + RANKING["post_weight"] * decay_factor((now - created_at).total_seconds() / 3600)
+        batch.append(PostRank(
+            post_id=pk,
+            title=title,
+            category_id=category_id,
+            published=published,
+            score=live * RANKING["reply_weight"] + accepted * RANKING["accept_weight"],
+            hot_score=hot_score if hot_score > HOT_EPSILON else 0,
+        ))
+        if len(batch) >= 1000:
+            PostRank.objects.bulk_create(batch)
+            batch = []
+    PostRank.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0008_post_reply_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRank',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='board.post')),
+                ('title', models.CharField(max_length=255)),
+                ('published', models.BooleanField(default=True)),
+                ('score', models.FloatField(default=0)),
+                ('hot_score', models.FloatField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='board.category')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('published', True)), fields=['-hot_score', '-post'], name='postrank_pub_hot_idx'), models.Index(condition=models.Q(('published', True)), fields=['-score', '-post'], name='postrank_pub_top_idx'), models.Index(condition=models.Q(('published', True)), fields=['category', '-hot_score', '-post'], name='postrank_cat_pub_hot_idx'), models.Index(condition=models.Q(('published', True)), fields=['category', '-score', '-post'], name='postrank_cat_pub_top_idx')],
+            },
+        ),
+        migrations.RunPython(fill_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:01
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# копия board.stats.TOP_CATEGORIES на момент миграции
+TOP_CATEGORIES = 5
+
+
+def fill_author_stats(apps, schema_editor):
+    # то же, что board.stats.rebuild, но на исторических моделях
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model("board", "Post")
+    Reply = apps.get_model("board", "Reply")
+    AuthorStats = apps.get_model("board", "AuthorStats")
+
+    def counts(queryset, field):
+        return dict(queryset.values_list(field).annotate(total=Count("id")).order_by())
+
+    posts = counts(Post.objects.all(), "author_id")
+    replies = counts(Reply.objects.all(), "author_id")
+    accepted = counts(Reply.objects.filter(accepted=True), "post__author_id")
+
+    top = defaultdict(list)
+    rows = (
+        Post.objects.values("author_id", "category__title").annotate(total=Count("id"))
+        .order_by("author_id", "-total", "category__title")
+    )
+    for row in rows.iterator(chunk_size=1000):
+        if len(top[row["author_id"]]) < TOP_CATEGORIES:
+            top[row["author_id"]].append({"title": row["category__title"], "count": row["total"]})
+
+    last = {}
+    latest = Post.objects.order_by("author_id", "-created_at", "-pk").values_list("author_id", "pk", "title", "created_at")
+    for author_id, pk, title, created_at in latest.iterator(chunk_size=1000):
+        last.setdefault(author_id, (pk, title, created_at))
+
+    batch = []
+    for user_id in User.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=1000):
+        last_id, last_title, last_created_at = last.get(user_id, (None, "", None))
+        batch.append(AuthorStats(
+            user_id=user_id,
+            post_count=posts.get(user_id, 0),
+            reply_count=replies.get(user_id, 0),
+            accepted_replies=accepted.get(user_id, 0),
+            last_post_id=last_id,
+            last_post_title=last_title,
+            last_post_created_at=last_created_at,
+            top_categories=top.get(user_id, []),
+        ))
+        if len(batch) >= 1000:
+            AuthorStats.objects.bulk_create(batch)
+            batch = []
+    AuthorStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('board', '0012_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('reply_count', models.PositiveIntegerField(default=0)),
+                ('accepted_replies', models.PositiveIntegerField(default=0)),
+                ('last_post_title', models.CharField(blank=True, max_length=255)),
+                ('last_post_created_at', models.DateTimeField(blank=True, null=True)),
+                ('top_categories', models.JSONField(blank=True, default=list)),
+                ('last_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='board.post')),
+            ],
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_accepted_at(apps, schema_editor):
+    # точное время принятия неизвестно — берём время отклика
+    Reply = apps.get_model("board", "Reply")
+    Reply.objects.filter(accepted=True, accepted_at__isnull=True).update(accepted_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0013_authorstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='reputation_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_accepted_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['-reputation_score'], name='author_reputation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['created_at'], name='reply_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['accepted_at'], name='reply_accepted_at_idx'),
+        ),
+    ]
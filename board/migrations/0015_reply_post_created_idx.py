@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0014_reputation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['post', 'created_at'], name='reply_post_live_idx'),
+        ),
+    ]
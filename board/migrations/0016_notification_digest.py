@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_emailed(apps, schema_editor):
+    # до сводок письма уходили сразу — старые уведомления в сводку не попадают
+    Notification = apps.get_model("board", "Notification")
+    Notification.objects.filter(emailed_at__isnull=True).update(emailed_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0015_reply_post_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersubscription',
+            name='digest',
+            field=models.CharField(choices=[('immediate', 'Сразу'), ('hourly', 'Сводка раз в час'), ('daily', 'Сводка раз в день')], default='immediate', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_emailed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('emailed_at__isnull', True)), fields=['user', 'created_at'], name='notification_digest_idx'),
+        ),
+    ]
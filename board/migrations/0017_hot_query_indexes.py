@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0016_notification_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newslettersubscription',
+            index=models.Index(condition=models.Q(('subscribed', True)), fields=['id'], name='newsletter_subscribed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('published', True)), fields=['-created_at'], name='post_pub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postrank',
+            index=models.Index(fields=['hot_score'], name='postrank_hot_score_idx'),
+        ),
+    ]
@@ -3,8 +3,9 @@ from ckeditor_uploader.fields import RichTextUploadingField
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 
-from board.choices import CATEGORY_CHOICES
+from board.choices import CATEGORY_CHOICES, DIGEST_CHOICES, DIGEST_IMMEDIATE, OUTBOX_STATUS_CHOICES, OUTBOX_PENDING
 
 User = settings.AUTH_USER_MODEL
 
@@ -26,6 +27,30 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=True)
 
+    # денормализованные счётчики, меняются только F()-выражениями (см. board.signals)
+    reply_count = models.PositiveIntegerField(default=0)
+    live_reply_count = models.PositiveIntegerField(default=0)
+    accepted_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ("reply_count", "live_reply_count", "accepted_count")
+
+    class Meta:
+        indexes = [
+            # «Мои посты» и подсказки фильтра «Мои отклики»
+            models.Index(fields=["author", "-created_at"], name="post_author_created_idx"),
+            # свежие опубликованные посты для еженедельной рассылки
+            models.Index(fields=["-created_at"], condition=models.Q(published=True), name="post_pub_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # обычное сохранение формы не должно затирать счётчики устаревшими значениями
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def excerpt(self, chars=200):
         import re
         text = re.sub('<[^<]+?>', '', self.body)
@@ -35,14 +60,100 @@ class Post(models.Model):
         return self.title
 
 
+class PostSummary(models.Model):
+    """Денормализованная проекция поста для списков: без body и без join'ов"""
+    post = models.OneToOneField(Post, primary_key=True, related_name="summary", on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    excerpt = models.TextField(blank=True)
+    author = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    author_username = models.CharField(max_length=150)
+    category = models.ForeignKey(Category, related_name="+", on_delete=models.PROTECT)
+    category_title = models.CharField(max_length=100)
+    created_at = models.DateTimeField()
+    published = models.BooleanField(default=True)
+
+    class Meta:
+        # частичные индексы: SQLite не ищет по индексу с булевым полем в начале
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-post"], condition=models.Q(published=True), name="postsummary_pub_feed_idx",
+            ),
+        ]
+
+    @classmethod
+    def build(cls, post):
+        """Несохранённая проекция поста; save() делает UPDATE, а при отсутствии строки INSERT"""
+        return cls(
+            post=post,
+            title=post.title,
+            excerpt=post.excerpt(),
+            author_id=post.author_id,
+            author_username=post.author.username,
+            category_id=post.category_id,
+            category_title=post.category.title,
+            created_at=post.created_at,
+            published=post.published,
+        )
+
+    def __str__(self):
+        return self.title
+
+
+class PostRank(models.Model):
+    """Строка лидерборда: предрасчитанные очки поста (см. board.ranking)"""
+    post = models.OneToOneField(Post, primary_key=True, related_name="rank", on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, related_name="+", on_delete=models.CASCADE)
+    published = models.BooleanField(default=True)
+    score = models.FloatField(default=0)
+    hot_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-hot_score", "-post"], condition=models.Q(published=True), name="postrank_pub_hot_idx"),
+            models.Index(fields=["-score", "-post"], condition=models.Q(published=True), name="postrank_pub_top_idx"),
+            models.Index(
+                fields=["category", "-hot_score", "-post"], condition=models.Q(published=True),
+                name="postrank_cat_pub_hot_idx",
+            ),
+            models.Index(
+                fields=["category", "-score", "-post"], condition=models.Q(published=True),
+                name="postrank_cat_pub_top_idx",
+            ),
+            # затухание трогает только строки с ненулевыми очками (board.ranking.decay)
+            models.Index(fields=["hot_score"], name="postrank_hot_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.title}: {self.score:.0f} / {self.hot_score:.2f}"
+
+
+class RankingWatermark(models.Model):
+    """Момент, к которому приведено затухание hot_score (одна строка, pk=1)"""
+    decayed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Затухание на {self.decayed_at:%d.%m.%Y %H:%M}"
+
+
 class Reply(models.Model):
     post = models.ForeignKey(Post, related_name="replies", on_delete=models.CASCADE)
     author = models.ForeignKey(User, related_name="replies", on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     accepted = models.BooleanField(default=False)
+    accepted_at = models.DateTimeField(null=True, blank=True)
     deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # окна событий для инкрементального пересчёта репутации (board.reputation)
+            models.Index(fields=["created_at"], name="reply_created_idx"),
+            models.Index(fields=["accepted_at"], name="reply_accepted_at_idx"),
+            # живые отклики поста по времени: ленивый список на странице поста и «Мои отклики»
+            models.Index(fields=["post", "created_at"], condition=models.Q(deleted=False), name="reply_post_live_idx"),
+        ]
+
     def __str__(self):
         return f"Reply by {self.author} to {self.post}"
 
@@ -66,6 +177,26 @@ class Newsletter(models.Model):
         return self.subject
 
 
+class NewsletterDelivery(models.Model):
+    """Доставка рассылки одному получателю: по этим строкам прерванная отправка продолжается"""
+    newsletter = models.ForeignKey(Newsletter, related_name="deliveries", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    email = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default=OUTBOX_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("newsletter", "user")
+        indexes = [
+            models.Index(fields=["newsletter", "status"], name="delivery_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.newsletter}: {self.email} ({self.status})"
+
+
 class Notification(models.Model):
     user = models.ForeignKey(
         User,
@@ -75,9 +206,20 @@ class Notification(models.Model):
     url = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
+    # когда событие ушло письмом; пусто — ждёт сводки (board.digests)
+    emailed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "read", "-created_at"], name="notification_inbox_idx"),
+            models.Index(
+                fields=["user", "created_at"], condition=models.Q(emailed_at__isnull=True),
+                name="notification_digest_idx",
+            ),
+            # для чистки старых прочитанных (board.notifications.purge_read)
+            models.Index(fields=["created_at"], condition=models.Q(read=True), name="notification_read_age_idx"),
+        ]
 
     def __str__(self):
         return f"Уведомление для {self.user}: {self.message}"
@@ -88,38 +230,101 @@ class Author(models.Model):
     avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
     bio = models.TextField(blank=True)
     reputation = models.IntegerField(default=0)
+    # точное значение с затуханием; reputation — его округление для показа
+    reputation_score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-reputation_score"], name="author_reputation_idx"),
+        ]
+
+    @cached_property
+    def stats(self):
+        """Материализованная статистика (AuthorStats), см. board.stats"""
+        from .stats import for_user
+        return for_user(self.user)
 
     def post_count(self):
-        return self.user.posts.count()
+        return self.stats.post_count
 
     def reply_count(self):
-        return self.user.replies.count()
+        return self.stats.reply_count
 
     def accepted_replies_count(self):
         """Количество принятых откликов на посты автора"""
-        return Reply.objects.filter(post__author=self.user, accepted=True).count()
+        return self.stats.accepted_replies
 
     def top_categories(self, limit=3):
-        """Чаще всего используемые категории"""
-        from django.db.models import Count
-        return (
-            self.user.posts.values("category__title")
-            .annotate(total=Count("id"))
-            .order_by("-total")[:limit]
-        )
+        """Чаще всего используемые категории: [{"title", "count"}]"""
+        return self.stats.top_categories[:limit]
 
     def last_post(self):
         """Последний пост автора"""
-        return self.user.posts.order_by("-created_at").first()
+        return self.stats.last_post
 
     def __str__(self):
         return self.user.username
 
 
+class AuthorStats(models.Model):
+    """Статистика автора для карточки; обновляется сигналами, пересчёт — rebuild_author_stats"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    post_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    # принятые отклики на посты автора
+    accepted_replies = models.PositiveIntegerField(default=0)
+    last_post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    last_post_title = models.CharField(max_length=255, blank=True)
+    last_post_created_at = models.DateTimeField(null=True, blank=True)
+    top_categories = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"Статистика {self.user_id}"
+
+
+class ReputationWatermark(models.Model):
+    """Момент, до которого события учтены в репутации и к которому приведено затухание"""
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Репутация на {self.computed_at:%d.%m.%Y %H:%M}"
+
+
 class NewsletterSubscription(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="newsletter_subscription")
     subscribed = models.BooleanField(default=True)
+    # как доставлять письма об откликах и новых постах
+    digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default=DIGEST_IMMEDIATE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # получатели еженедельной рассылки по порядку pk
+            models.Index(fields=["id"], condition=models.Q(subscribed=True), name="newsletter_subscribed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {'подписан' if self.subscribed else 'отписан'}"
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в outbox: пишется в транзакции запроса, отправляется воркером (board.outbox)"""
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default=OUTBOX_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.user.username}: {'подписан' if self.subscribed else 'отписан'}"
\ No newline at end of file
+        return f"{self.to}: {self.subject} ({self.status})"
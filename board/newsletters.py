@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .choices import OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_FAILED
+from .models import NewsletterDelivery
+
+User = get_user_model()
+
+BATCH_SIZE = getattr(settings, "NEWSLETTER_BATCH_SIZE", 200)
+MAX_ATTEMPTS = getattr(settings, "NEWSLETTER_MAX_ATTEMPTS", 3)
+
+
+def plan_deliveries(newsletter, batch_size=BATCH_SIZE):
+    """Создаёт недостающие строки доставки, читая получателей потоком"""
+    recipients = (
+        User.objects.filter(is_active=True).exclude(email="")
+        .order_by("pk").values_list("pk", "email")
+    )
+    batch = []
+    for user_id, email in recipients.iterator(chunk_size=batch_size):
+        batch.append(NewsletterDelivery(newsletter=newsletter, user_id=user_id, email=email))
+        if len(batch) >= batch_size:
+            NewsletterDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        NewsletterDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _claim(newsletter, statuses, last_pk, batch_size):
+    """
+    Переводит следующую пачку в "sending" так, чтобы параллельный deliver() её не взял.
+    Заблокированные строки пропускаются; где блокировок строк нет (SQLite),
+    гонку ловит сверка числа обновлённых строк — тогда пачка выбирается заново.
+    """
+    while True:
+        with transaction.atomic():
+            ids = list(
+                newsletter.deliveries.select_for_update(skip_locked=True)
+                .filter(pk__gt=last_pk, status__in=statuses, attempts__lt=MAX_ATTEMPTS)
+                .order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                return []
+            claimed = NewsletterDelivery.objects.filter(pk__in=ids, status__in=statuses).update(status=OUTBOX_SENDING)
+            if claimed == len(ids):
+                break
+            transaction.set_rollback(True)
+    return list(NewsletterDelivery.objects.filter(pk__in=ids).order_by("pk"))
+
+
+def deliver(newsletter, batch_size=BATCH_SIZE, resend_unconfirmed=False, progress=None):
+    """
+    Отправляет рассылку пачками по одному SMTP-соединению.
+    Уже доставленные получатели пропускаются, поэтому повторный запуск безопасен.
+    Строки, оставшиеся в "sending" после падения, могли уйти — без resend_unconfirmed их не трогаем;
+    с ним параллельные запуски не защищены друг от друга.
+    """
+    plan_deliveries(newsletter, batch_size)
+    html = render_to_string("emails/newsletter.html", {"body": newsletter.body, "subject": newsletter.subject})
+    statuses = [OUTBOX_PENDING, OUTBOX_FAILED] + ([OUTBOX_SENDING] if resend_unconfirmed else [])
+
+    started = time.monotonic()
+    sent = failed = 0
+    last_pk = 0
+    while True:
+        batch = _claim(newsletter, statuses, last_pk, batch_size)
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        with get_connection() as connection:
+            for delivery in batch:
+                msg = EmailMultiAlternatives(
+                    newsletter.subject, newsletter.body, settings.DEFAULT_FROM_EMAIL,
+                    [delivery.email], connection=connection,
+                )
+                msg.attach_alternative(html, "text/html")
+                delivery.attempts += 1
+                try:
+                    msg.send()
+                except Exception as exc:
+                    delivery.status, delivery.error = OUTBOX_FAILED, f"{type(exc).__name__}: {exc}"[:2000]
+                    failed += 1
+                else:
+                    delivery.status, delivery.error, delivery.sent_at = OUTBOX_SENT, "", timezone.now()
+                    sent += 1
+        NewsletterDelivery.objects.bulk_update(batch, ["status", "attempts", "error", "sent_at"])
+
+        if progress:
+            progress(sent, failed, time.monotonic() - started)
+
+    remaining = newsletter.deliveries.exclude(status=OUTBOX_SENT).filter(attempts__lt=MAX_ATTEMPTS).exists()
+    if not remaining and not newsletter.sent:
+        newsletter.sent = True
+        newsletter.save(update_fields=["sent"])
+    return sent, failed, time.monotonic() - started
@@ -0,0 +1,162 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .choices import DIGEST_IMMEDIATE
+from .db import use_primary
+from .models import NewsletterSubscription, Notification
+from .push import push
+
+UNREAD_TTL = getattr(settings, "UNREAD_NOTIFICATIONS_TTL", 60)
+RETENTION_DAYS = getattr(settings, "NOTIFICATIONS_RETENTION_DAYS", 90)
+PURGE_BATCH_SIZE = getattr(settings, "NOTIFICATIONS_PURGE_BATCH_SIZE", 1000)
+
+# непрочитанные сверху, внутри — новые сверху; ровно по индексу (user, read, created_at)
+INBOX_ORDERING = ("read", "-created_at", "-pk")
+
+
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _writes_key(user_id):
+    return f"notifications:unread:{user_id}:writes"
+
+
+def unread_count(user_id, fresh=False):
+    """
+    Непрочитанные уведомления пользователя: из кэша, при промахе — один COUNT.
+    fresh=True всегда считает по БД (ответ массовой отметки).
+    """
+    key = _unread_key(user_id)
+    count = None if fresh else cache.get(key)
+    if count is None:
+        # отметка записей снимается до COUNT: если счётчик сдвинули, пока шёл подсчёт,
+        # инкремент мог пройти мимо кэша — тогда результат не кэшируется
+        writes = cache.get(_writes_key(user_id))
+        # значение живёт в кэше долго — отставшая реплика закрепила бы его надолго
+        with use_primary():
+            count = Notification.objects.filter(user_id=user_id, read=False).count()
+
+        def store():
+            if cache.get(_writes_key(user_id)) != writes:
+                return
+            # add при обычном промахе не затирает значение, записанное параллельно
+            if fresh:
+                cache.set(key, count, UNREAD_TTL)
+            else:
+                cache.add(key, count, UNREAD_TTL)
+
+        transaction.on_commit(store)
+    return count
+
+
+def adjust_unread(user_id, delta):
+    """Атомарно сдвигает счётчик после коммита; если его нет в кэше — посчитается при чтении"""
+    def apply():
+        writes_key = _writes_key(user_id)
+        cache.add(writes_key, 0, UNREAD_TTL)
+        for key, step in ((writes_key, 1), (_unread_key(user_id), delta)):
+            try:
+                cache.incr(key, step)
+            except ValueError:
+                pass
+    transaction.on_commit(apply)
+
+
+def digest_modes(user_ids):
+    """Режим доставки писем по пользователям; без настроенной подписки — сразу"""
+    modes = dict.fromkeys(user_ids, DIGEST_IMMEDIATE)
+    if modes:
+        modes.update(
+            NewsletterSubscription.objects.filter(user_id__in=list(modes)).values_list("user_id", "digest")
+        )
+    return modes
+
+
+def notification_event(notification):
+    """Push-событие о новом уведомлении (board.push)"""
+    return {
+        "type": "notification",
+        "id": notification.pk,
+        "message": notification.message,
+        "url": notification.url or "",
+    }
+
+
+def notify_many(notifications):
+    """
+    Создаёт уведомления одним INSERT. post_save при этом не шлётся,
+    поэтому счётчики непрочитанных и push обновляются здесь.
+    """
+    created = Notification.objects.bulk_create(notifications)
+    for user_id, total in Counter(n.user_id for n in created if not n.read).items():
+        adjust_unread(user_id, total)
+    for notification in created:
+        push(notification.user_id, notification_event(notification))
+    return created
+
+
+def mark_read(user, notifications):
+    """Отмечает прочитанными уведомления пользователя одним UPDATE"""
+    updated = notifications.filter(user=user, read=False).update(read=True)
+    if updated:
+        adjust_unread(user.pk, -updated)
+        # остальные открытые вкладки пользователя уменьшат бейдж
+        push(user.pk, {"type": "read", "updated": updated})
+    return updated
+
+
+def bulk_selection(user, mark_all=False, ids=None, before=None):
+    """
+    Уведомления пользователя для массовой отметки: все, набор id или всё до момента before.
+    Возвращает None, если ничего не выбрано.
+    """
+    notifications = Notification.objects.filter(user=user)
+    if mark_all:
+        return notifications
+    if ids:
+        return notifications.filter(pk__in=ids)
+    if before:
+        return notifications.filter(created_at__lte=before)
+    return None
+
+
+def reconcile_unread(since=None, batch_size=1000):
+    """Пересчитывает счётчики пользователей, у которых были уведомления с момента since"""
+    since = since or timezone.now() - timedelta(seconds=UNREAD_TTL)
+    user_ids = list(
+        Notification.objects.filter(created_at__gte=since)
+        .order_by().values_list("user_id", flat=True).distinct()
+    )
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        counts = dict.fromkeys(chunk, 0)
+        counts.update(
+            Notification.objects.filter(user_id__in=chunk, read=False)
+            .order_by().values("user_id").annotate(unread=Count("pk"))
+            .values_list("user_id", "unread")
+        )
+        cache.set_many({_unread_key(user_id): n for user_id, n in counts.items()}, UNREAD_TTL)
+    return len(user_ids)
+
+
+def purge_read(days=RETENTION_DAYS, batch_size=PURGE_BATCH_SIZE, max_batches=1000):
+    """Удаляет прочитанные уведомления старше days дней ограниченными пачками"""
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    for _ in range(max_batches):
+        ids = list(
+            Notification.objects.filter(read=True, created_at__lt=cutoff)
+            .order_by().values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        Notification.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+    return total
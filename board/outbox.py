@@ -0,0 +1,159 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .choices import OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_FAILED
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 100)
+MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+# сколько строка может висеть в "sending", прежде чем её заберёт другой воркер
+LEASE = timedelta(minutes=10)
+
+
+def _email(subject, text, address, html="", from_email=None):
+    return OutgoingEmail(
+        subject=subject,
+        body=text,
+        html=html,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or "",
+        to=address,
+    )
+
+
+def _store(emails):
+    emails = OutgoingEmail.objects.bulk_create(emails)
+    if emails:
+        transaction.on_commit(schedule_drain)
+    return emails
+
+
+def enqueue(subject, text, recipients, html="", from_email=None):
+    """
+    Кладёт письмо в outbox — по строке на адрес — в текущей транзакции.
+    Отправка запускается после коммита.
+    """
+    return _store([
+        _email(subject, text, address, html, from_email)
+        for address in dict.fromkeys(recipients) if address
+    ])
+
+
+def enqueue_many(messages):
+    """Разные письма одним INSERT: messages — кортежи (subject, text, address, html)"""
+    return _store([_email(*message) for message in messages if message[2]])
+
+
+def send_now(subject, text, recipients, html=""):
+    """
+    Для воркеров: строки пишутся уже захваченными и сразу уходят пачкой
+    по одному SMTP-соединению. Неудачные дошлёт drain() по backoff,
+    а если воркер упал посередине — после истечения LEASE.
+    """
+    lease_until = timezone.now() + LEASE
+    emails = []
+    for address in dict.fromkeys(recipients):
+        if address:
+            email = _email(subject, text, address, html)
+            email.status, email.next_attempt_at = OUTBOX_SENDING, lease_until
+            emails.append(email)
+    if not emails:
+        return 0, 0
+    emails = OutgoingEmail.objects.bulk_create(emails)
+    sent = send_batch(emails)
+    return sent, len(emails) - sent
+
+
+def schedule_drain():
+    from appointment.tasks import drain_outbox
+    try:
+        # без повторов и без бэкенда результатов: недоступный брокер не держит запрос
+        drain_outbox.apply_async(retry=False, ignore_result=True)
+    except Exception:
+        # брокер недоступен — письма заберёт периодический drain_outbox
+        logger.warning("Could not schedule outbox drain", exc_info=True)
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(60 * 2 ** attempts, 3600))
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    due = Q(status=OUTBOX_PENDING) | Q(status=OUTBOX_SENDING)
+    with transaction.atomic():
+        ids = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(due, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=ids).update(status=OUTBOX_SENDING, next_attempt_at=now + LEASE)
+    return list(OutgoingEmail.objects.filter(pk__in=ids).order_by("pk"))
+
+
+def _message(email, connection):
+    msg = EmailMultiAlternatives(email.subject, email.body, email.from_email or None, [email.to], connection=connection)
+    if email.html:
+        msg.attach_alternative(email.html, "text/html")
+    return msg
+
+
+def send_batch(emails):
+    """Отправляет пачку по одному SMTP-соединению и проставляет статусы"""
+    now = timezone.now()
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        errors = {email.pk: exc for email in emails}
+    else:
+        errors = {}
+        try:
+            for email in emails:
+                try:
+                    connection.send_messages([_message(email, connection)])
+                except Exception as exc:
+                    errors[email.pk] = exc
+        finally:
+            connection.close()
+
+    for email in emails:
+        exc = errors.get(email.pk)
+        email.attempts += 1
+        if exc is None:
+            email.status, email.sent_at, email.last_error = OUTBOX_SENT, now, ""
+            sent += 1
+        else:
+            email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = OUTBOX_FAILED
+            else:
+                email.status, email.next_attempt_at = OUTBOX_PENDING, now + backoff(email.attempts)
+    OutgoingEmail.objects.bulk_update(
+        emails, ["status", "attempts", "last_error", "next_attempt_at", "sent_at"]
+    )
+    return sent
+
+
+def drain(batch_size=BATCH_SIZE, max_batches=50):
+    """Разбирает outbox пачками; возвращает (отправлено, ошибок)"""
+    sent = failed = 0
+    for _ in range(max_batches):
+        emails = _claim(batch_size)
+        if not emails:
+            break
+        ok = send_batch(emails)
+        sent += ok
+        failed += len(emails) - ok
+        if len(emails) < batch_size:
+            break
+    return sent, failed
@@ -0,0 +1,192 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPage:
+    """Страница курсорной пагинации: без COUNT(*) и без OFFSET"""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _json_default(value):
+    # DjangoJSONEncoder обрезает микросекунды, а ключу нужна полная точность
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Unsupported cursor value: {value!r}")
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Возвращает список значений ключа или None, если курсор битый"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class InvalidCursor(ValueError):
+    """Курсор не декодируется или не подходит к порядку сортировки"""
+
+
+def _model_field(model, path):
+    field = None
+    for name in path.split("__"):
+        field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        model = field.related_model or model
+    return field
+
+
+def parse_cursor(model, ordering, token):
+    """
+    Значения ключа из курсора, приведённые к типам полей ordering.
+    None — курсора нет; InvalidCursor — курсор подделан или устарел.
+    """
+    if not token:
+        return None
+    values = decode_cursor(token)
+    if values is None or len(values) != len(ordering):
+        raise InvalidCursor(token)
+    try:
+        values = [_model_field(model, f.lstrip("-")).to_python(v) for f, v in zip(ordering, values)]
+    except (FieldDoesNotExist, ValidationError, TypeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+    if any(v is None for v in values):
+        raise InvalidCursor(token)
+    return values
+
+
+def _resolve(obj, field):
+    for part in field.split("__"):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _after(ordering, values):
+    """Условие "строго после курсора" для составного ключа сортировки"""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, cursor=None, per_page=10, ordering=("-created_at", "-pk"), strict=False):
+    """
+    Курсорная (keyset) пагинация по уникальному ключу сортировки.
+    Последнее поле ordering должно быть уникальным (обычно pk).
+    Битый курсор даёт первую страницу, а при strict=True — InvalidCursor.
+    """
+    ordering = tuple(ordering)
+    queryset = queryset.order_by(*ordering)
+    try:
+        values = parse_cursor(queryset.model, ordering, cursor)
+    except InvalidCursor:
+        if strict:
+            raise
+        values = None
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([_resolve(last, f.lstrip("-")) for f in ordering])
+    return KeysetPage(rows, next_cursor)
+
+
+def pk_ranges(queryset, chunk_size):
+    """
+    Границы пачек (первый pk, последний pk) по chunk_size строк — читаются только id, потоком.
+    Пачка потом выбирается тем же queryset с pk__gte/pk__lte.
+    """
+    first = last = None
+    count = 0
+    for pk in queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+        if first is None:
+            first = pk
+        last = pk
+        count += 1
+        if count == chunk_size:
+            yield first, last
+            first, count = None, 0
+    if first is not None:
+        yield first, last
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF-обёртка над keyset_paginate.
+    Порядок берётся из view.keyset_ordering (по умолчанию новые сверху).
+    """
+    page_size = 20
+    cursor_query_param = "cursor"
+    ordering = ("-created_at", "-pk")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, "keyset_ordering", None) or self.ordering
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            self.page = keyset_paginate(queryset, cursor, self.page_size, ordering, strict=True)
+        except InvalidCursor:
+            raise ParseError("Invalid cursor")
+        return self.page.object_list
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+def _deliver(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass  # клиент не успевает читать — событие теряется, соединение живёт
+
+
+class LocalBroker:
+    """
+    Внутрипроцессный pub/sub: user_id → очереди открытых SSE-соединений.
+    publish() можно звать из синхронного кода и других потоков.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, event):
+        self._dispatch(user_id, event)
+
+    def _dispatch(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+
+
+class RedisBroker(LocalBroker):
+    """
+    События идут через Redis PUBLISH, так что доходят и из Celery-воркеров,
+    и до соединений в других процессах. Один слушатель канала на процесс.
+    """
+    channel = "board:push"
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        try:
+            self._client.publish(self.channel, json.dumps({"user": user_id, "event": event}))
+        except Exception:
+            logger.warning("Push publish failed", exc_info=True)
+
+    async def _listen(self):
+        import redis.asyncio
+        client = redis.asyncio.Redis.from_url(self.url)
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                self._dispatch(data["user"], data["event"])
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        url = getattr(settings, "PUSH_REDIS_URL", None)
+        _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def push(user_id, event):
+    """Отправляет событие пользователю после коммита текущей транзакции"""
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import bump as bump_generation
+from .models import Post, PostRank, RankingWatermark, Reply
+
+RANKING = {
+    "post_weight": 1.0,
+    "reply_weight": 1.0,
+    "accept_weight": 3.0,
+    "half_life_hours": 24.0,
+    **getattr(settings, "RANKING", {}),
+}
+
+# ниже этого порога "горячие" очки обнуляются и больше не пересчитываются
+HOT_EPSILON = 1e-3
+
+
+def decay_factor(hours):
+    return 0.5 ** (hours / RANKING["half_life_hours"])
+
+
+def sync_post(post, created=False):
+    """Заголовок/категория/публикация поста → строка лидерборда"""
+    fields = {"title": post.title, "category_id": post.category_id, "published": post.published}
+    if created:
+        PostRank.objects.create(post=post, hot_score=RANKING["post_weight"], **fields)
+    elif not PostRank.objects.filter(pk=post.pk).update(**fields):
+        PostRank.objects.create(post=post, **fields)
+
+
+def bump(post_ids, weight):
+    """
+    Добавляет событие весом weight каждому посту (повторы id суммируются).
+    Событие считается произошедшим в момент последнего затухания —
+    погрешность не больше интервала decay().
+    """
+    per_post = defaultdict(int)
+    for post_id in post_ids:
+        per_post[post_id] += 1
+    for post_id, n in per_post.items():
+        delta = weight * n
+        PostRank.objects.filter(pk=post_id).update(
+            score=Greatest(F("score") + delta, Value(0.0)),
+            hot_score=Greatest(F("hot_score") + delta, Value(0.0)),
+        )
+
+
+def retract(replies):
+    """
+    Снимает вклад удаляемых откликов. score хранит полные веса, а hot_score
+    приведён к последнему decay(): вклад события (создания или принятия) с тех пор
+    затух, событие новее отметки ещё не затухало. Зовётся в транзакции удаления;
+    блокировка отметки не даёт decay() вклиниться между чтением и вычитанием.
+    """
+    replies = list(replies)
+    if not replies:
+        return
+    with transaction.atomic():
+        decayed_at = (
+            RankingWatermark.objects.select_for_update().filter(pk=1)
+            .values_list("decayed_at", flat=True).first()
+        )
+        score, hot = defaultdict(float), defaultdict(float)
+        for reply in replies:
+            events = [(RANKING["reply_weight"], reply.created_at)]
+            if reply.accepted:
+                events.append((RANKING["accept_weight"], reply.accepted_at or reply.created_at))
+            for weight, at in events:
+                score[reply.post_id] += weight
+                hours = (decayed_at - at).total_seconds() / 3600 if decayed_at and at < decayed_at else 0
+                hot[reply.post_id] += weight * decay_factor(hours)
+        for post_id in score:
+            PostRank.objects.filter(pk=post_id).update(
+                score=Greatest(F("score") - score[post_id], Value(0.0)),
+                hot_score=Greatest(F("hot_score") - hot[post_id], Value(0.0)),
+            )
+
+
+def decay(now=None):
+    """Затухание hot_score с момента прошлого запуска; трогает только "живые" строки"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        # блокировка отметки не даёт двум воркерам применить один и тот же интервал дважды
+        watermark, created = RankingWatermark.objects.select_for_update().get_or_create(
+            pk=1, defaults={"decayed_at": now}
+        )
+        if created or now <= watermark.decayed_at:
+            return 0
+        factor = decay_factor((now - watermark.decayed_at).total_seconds() / 3600)
+        active = PostRank.objects.filter(hot_score__gt=HOT_EPSILON)
+        updated = active.update(hot_score=F("hot_score") * factor)
+        PostRank.objects.filter(hot_score__gt=0, hot_score__lte=HOT_EPSILON).update(hot_score=0)
+        watermark.decayed_at = now
+        watermark.save(update_fields=["decayed_at"])
+        if updated:
+            transaction.on_commit(lambda: bump_generation("ranking"))
+    return updated
+
+
+def rebuild(batch_size=1000):
+    """Полный пересчёт лидерборда по постам и откликам"""
+    now = timezone.now()
+    # старше десяти периодов полураспада вклад пренебрежимо мал
+    horizon = now - timedelta(hours=RANKING["half_life_hours"] * 10)
+
+    hot = defaultdict(float)
+    recent = Reply.objects.filter(
+        Q(created_at__gte=horizon) | Q(accepted_at__gte=horizon), deleted=False
+    ).values_list("post_id", "created_at", "accepted", "accepted_at")
+    for post_id, created_at, accepted, accepted_at in recent.iterator(chunk_size=batch_size):
+        # принятие — отдельное событие, затухает с момента принятия
+        hot[post_id] += RANKING["reply_weight"] * decay_factor((now - created_at).total_seconds() / 3600)
+        if accepted:
+            accepted_at = accepted_at or created_at
+            hot[post_id] += RANKING["accept_weight"] * decay_factor((now - accepted_at).total_seconds() / 3600)
+
+    posts = Post.objects.only(
+        "id", "title", "category_id", "published", "created_at", "live_reply_count", "accepted_count"
+    ).order_by("pk")
+    batch = []
+    for post in posts.iterator(chunk_size=batch_size):
+        age_hours = (now - post.created_at).total_seconds() / 3600
+        batch.append(PostRank(
+            post_id=post.pk,
+            title=post.title,
+            category_id=post.category_id,
+            published=post.published,
+            score=post.live_reply_count * RANKING["reply_weight"] + post.accepted_count * RANKING["accept_weight"],
+            hot_score=hot[post.pk] + RANKING["post_weight"] * decay_factor(age_hours),
+        ))
+        if len(batch) >= batch_size:
+            _flush(batch)
+            batch = []
+    if batch:
+        _flush(batch)
+    PostRank.objects.filter(hot_score__lte=HOT_EPSILON).update(hot_score=0)
+    RankingWatermark.objects.update_or_create(pk=1, defaults={"decayed_at": now})
+    bump_generation("ranking")
+
+
+def _flush(batch):
+    PostRank.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["post"],
+        update_fields=["title", "category", "published", "score", "hot_score"],
+    )
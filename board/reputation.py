@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField
+from django.db.models.functions import Cast, Round, TruncHour
+from django.utils import timezone
+
+from .models import Author, Post, Reply, ReputationWatermark
+
+REPUTATION = {
+    "reply_weight": 1.0,
+    "accept_weight": 10.0,
+    # отклик другого пользователя на пост автора
+    "engagement_weight": 2.0,
+    "half_life_days": 90.0,
+    # события моложе этого могут быть ещё не закоммичены — ждут следующего запуска
+    "lag_seconds": 60,
+    **getattr(settings, "REPUTATION", {}),
+}
+
+# ниже этого порога очки не затухают дальше, строки не трогаются
+EPSILON = 1e-3
+BUCKET = timedelta(hours=1)
+BATCH_SIZE = 1000
+
+
+def decay_factor(seconds):
+    return 0.5 ** (seconds / (REPUTATION["half_life_days"] * 86400))
+
+
+def _sources():
+    """(вес, queryset событий, поле получателя очков, поле времени события)"""
+    live = Reply.objects.filter(deleted=False)
+    return [
+        (REPUTATION["reply_weight"], live, "author_id", "created_at"),
+        (REPUTATION["accept_weight"], live.filter(accepted=True, accepted_at__isnull=False), "author_id", "accepted_at"),
+        (REPUTATION["engagement_weight"], live.exclude(author=F("post__author")), "post__author_id", "created_at"),
+    ]
+
+
+def _scores(at, since=None):
+    """
+    user_id → очки событий из (since, at], приведённые к моменту at.
+    База отдаёт события, сгруппированные по (пользователь, час), — затухание
+    считается на группу, а не на строку.
+    """
+    scores = defaultdict(float)
+    for weight, events, user_field, time_field in _sources():
+        events = events.filter(**{f"{time_field}__lte": at})
+        if since is not None:
+            events = events.filter(**{f"{time_field}__gt": since})
+        rows = (
+            events.annotate(bucket=TruncHour(time_field))
+            .values_list(user_field, "bucket")
+            .annotate(total=Count("id"))
+            .order_by()
+        )
+        for user_id, bucket, total in rows:
+            age = max((at - bucket - BUCKET / 2).total_seconds(), 0)
+            scores[user_id] += weight * total * decay_factor(age)
+    return scores
+
+
+def _write(scores, add=False):
+    """Записывает очки в профили авторов (недостающие профили создаются)"""
+    user_ids = list(scores)
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        chunk = user_ids[i:i + BATCH_SIZE]
+        Author.objects.bulk_create([Author(user_id=pk) for pk in chunk], ignore_conflicts=True)
+        authors = list(Author.objects.filter(user_id__in=chunk).only("user_id", "reputation", "reputation_score"))
+        for author in authors:
+            # снятые очки считаются точнее, чем начисленные по часам, — в минус не уходим
+            author.reputation_score = max((author.reputation_score if add else 0.0) + scores[author.user_id], 0.0)
+            author.reputation = round(author.reputation_score)
+        Author.objects.bulk_update(authors, ["reputation_score", "reputation"])
+
+
+def _watermark_until(now):
+    return (now or timezone.now()) - timedelta(seconds=REPUTATION["lag_seconds"])
+
+
+def recompute(now=None):
+    """Полный пересчёт по всей истории (бэкфилл, смена весов)"""
+    until = _watermark_until(now)
+    with transaction.atomic():
+        ReputationWatermark.objects.select_for_update().filter(pk=1).first()
+        scores = _scores(until)
+        Author.objects.exclude(reputation_score=0, reputation=0).update(reputation_score=0.0, reputation=0)
+        _write(scores)
+        ReputationWatermark.objects.update_or_create(pk=1, defaults={"computed_at": until})
+    return len(scores)
+
+
+def update(now=None):
+    """
+    Инкрементальный шаг: затухание накопленных очков с прошлого запуска
+    плюс события после водяной отметки. Без отметки — полный пересчёт.
+    """
+    until = _watermark_until(now)
+    with transaction.atomic():
+        watermark = ReputationWatermark.objects.select_for_update().filter(pk=1).first()
+        if watermark is None:
+            return recompute(now)
+        if until <= watermark.computed_at:
+            return 0
+
+        factor = decay_factor((until - watermark.computed_at).total_seconds())
+        decayed = F("reputation_score") * factor
+        Author.objects.filter(reputation_score__gt=EPSILON).update(
+            reputation_score=decayed,
+            reputation=Cast(Round(decayed), IntegerField()),
+        )
+        scores = _scores(until, since=watermark.computed_at)
+        _write(scores, add=True)
+
+        watermark.computed_at = until
+        watermark.save(update_fields=["computed_at"])
+    return len(scores)
+
+
+def retract(replies):
+    """
+    Отрицательные события: снимает очки, уже начисленные за удаляемые живые
+    отклики (update() видит только новые события и сам их не вычтет).
+    Что моложе водяной отметки, ещё не учтено — с этим ничего делать не нужно.
+    Зовётся в транзакции удаления; блокировка отметки не даёт update() вклиниться.
+    """
+    replies = list(replies)
+    if not replies:
+        return 0
+    watermark = ReputationWatermark.objects.select_for_update().filter(pk=1).first()
+    if watermark is None:
+        return 0
+    at = watermark.computed_at
+    post_authors = dict(
+        Post.objects.filter(pk__in={r.post_id for r in replies}).values_list("pk", "author_id")
+    )
+
+    scores = defaultdict(float)
+    for reply in replies:
+        if reply.created_at <= at:
+            factor = decay_factor((at - reply.created_at).total_seconds())
+            scores[reply.author_id] -= REPUTATION["reply_weight"] * factor
+            post_author_id = post_authors.get(reply.post_id)
+            if post_author_id is not None and post_author_id != reply.author_id:
+                scores[post_author_id] -= REPUTATION["engagement_weight"] * factor
+        if reply.accepted and reply.accepted_at and reply.accepted_at <= at:
+            factor = decay_factor((at - reply.accepted_at).total_seconds())
+            scores[reply.author_id] -= REPUTATION["accept_weight"] * factor
+    _write(scores, add=True)
+    return len(scores)
@@ -0,0 +1,143 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+from django.utils.translation import get_language
+
+# слот языка в rowid FTS-таблицы: "" — документ без перевода
+LANGUAGE_SLOTS = {"": 0, **{code: i + 1 for i, (code, _) in enumerate(settings.LANGUAGES)}}
+ROWID_STRIDE = 8
+
+MAX_RESULTS = getattr(settings, "SEARCH_MAX_RESULTS", 500)
+
+
+def post_documents(post):
+    """
+    Документы поста для индекса: (язык, заголовок, текст без тегов).
+    С modeltranslation — по документу на язык, без неё — один общий.
+    """
+    if not hasattr(post, f"title_{settings.LANGUAGE_CODE}"):
+        return [("", post.title, strip_tags(post.body))]
+    docs = []
+    for code, _ in settings.LANGUAGES:
+        title = getattr(post, f"title_{code}", None) or post.title
+        body = getattr(post, f"body_{code}", None) or post.body
+        docs.append((code, title, strip_tags(body)))
+    return docs
+
+
+def _terms(query):
+    return re.findall(r"\w+", query or "")[:16]
+
+
+class SQLiteFTSBackend:
+    """FTS5-таблица board_post_fts, rowid = post_id * ROWID_STRIDE + слот языка"""
+    table = "board_post_fts"
+
+    def index_post(self, post):
+        self.remove_post(post.pk)
+        if not post.published:
+            return
+        rows = [
+            (post.pk * ROWID_STRIDE + LANGUAGE_SLOTS.get(lang, 0), title, body, lang)
+            for lang, title, body in post_documents(post)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, body, lang) VALUES (%s, %s, %s, %s)", rows
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid BETWEEN %s AND %s",
+                [post_id * ROWID_STRIDE, post_id * ROWID_STRIDE + ROWID_STRIDE - 1],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def search(self, query, language, limit):
+        terms = _terms(query)
+        if not terms:
+            return []
+        match = " ".join('"%s"*' % term for term in terms)
+        with connection.cursor() as cursor:
+            # bm25() нельзя звать внутри агрегата, поэтому дубли языков убираем здесь
+            cursor.execute(
+                f"SELECT rowid / {ROWID_STRIDE} FROM {self.table} "
+                f"WHERE {self.table} MATCH %s AND lang IN (%s, '') "
+                f"ORDER BY bm25({self.table}, 10.0, 1.0) LIMIT %s",
+                [match, language, limit * 2],
+            )
+            post_ids = dict.fromkeys(row[0] for row in cursor.fetchall())
+        return list(post_ids)[:limit]
+
+
+class PostgresSearchBackend:
+    """tsvector-документы в board_post_search с GIN-индексом"""
+    table = "board_post_search"
+    configs = getattr(settings, "SEARCH_CONFIGS", {"ru": "russian", "en": "english", "": "simple"})
+
+    def _config(self, lang):
+        return self.configs.get(lang, "simple")
+
+    def index_post(self, post):
+        self.remove_post(post.pk)
+        if not post.published:
+            return
+        with connection.cursor() as cursor:
+            for lang, title, body in post_documents(post):
+                config = self._config(lang)
+                cursor.execute(
+                    f"INSERT INTO {self.table} (post_id, lang, document) VALUES (%s, %s, "
+                    f"setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                    f"setweight(to_tsvector(%s::regconfig, %s), 'B'))",
+                    [post.pk, lang, config, title, config, body],
+                )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE post_id = %s", [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def search(self, query, language, limit):
+        if not _terms(query):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT post_id, max(ts_rank(document, websearch_to_tsquery(%s::regconfig, %s))) AS rank "
+                f"FROM {self.table} "
+                f"WHERE document @@ websearch_to_tsquery(%s::regconfig, %s) AND lang IN (%s, '') "
+                f"GROUP BY post_id ORDER BY rank DESC LIMIT %s",
+                [self._config(language), query, self._config(language), query, language, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, "SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(f"Нет поискового бэкенда для {connection.vendor}, задайте SEARCH_BACKEND")
+
+
+def search_post_ids(query, language=None, limit=MAX_RESULTS):
+    """Id опубликованных постов по релевантности"""
+    return get_backend().search(query, (language or get_language() or settings.LANGUAGE_CODE)[:2], limit)
@@ -1,6 +1,77 @@
 from rest_framework import serializers
 
-from .models import Post, Reply, Category, Subscription
+from .models import Post, PostRank, PostSummary, Reply, Category, Subscription, Notification
+
+
+def requested_fields(request):
+    """Поля из ?fields=id,title или None, если параметр не задан"""
+    raw = request.query_params.get("fields") if request is not None else None
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(",") if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Верхний сериализатор отдаёт только поля из ?fields= (неизвестные имена игнорируются)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get("request"))
+        if fields and fields & set(self.fields):
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+def _model_field(model, name):
+    for field in model._meta.get_fields():
+        if name in (field.name, getattr(field, "attname", None)):
+            return field
+    return None
+
+
+def optimize_queryset(queryset, serializer, extra_fields=()):
+    """
+    select_related/only по полям сериализатора: FK, которые сериализуются
+    объектом, подтягиваются JOIN'ом, остальные колонки не загружаются.
+    Если поле читает не колонку (метод, свойство), only() не применяется.
+    extra_fields — колонки, нужные помимо сериализатора (ключ пагинации).
+    """
+    related, columns = set(), set(extra_fields)
+    complete = True
+
+    def walk(model, fields, prefix):
+        nonlocal complete
+        for field in fields.values():
+            if field.source == "*":
+                complete = False
+                continue
+            current, path = model, prefix
+            attrs = field.source.split(".")
+            for i, attr in enumerate(attrs):
+                model_field = _model_field(current, attr)
+                if model_field is None or model_field.many_to_many or model_field.one_to_many:
+                    complete = False
+                    break
+                name = path + model_field.name
+                columns.add(name)
+                if (
+                    not model_field.is_relation
+                    or attr != model_field.name
+                    or isinstance(field, serializers.PrimaryKeyRelatedField)
+                ):
+                    break  # хватает самой колонки (для FK — *_id)
+                related.add(name)
+                if i == len(attrs) - 1 and isinstance(field, serializers.BaseSerializer):
+                    walk(model_field.related_model, field.fields, name + "__")
+                current, path = model_field.related_model, name + "__"
+
+    child = getattr(serializer, "child", serializer)
+    walk(queryset.model, child.fields, "")
+    if related:
+        queryset = queryset.select_related(*related)
+    if complete:
+        queryset = queryset.only(queryset.model._meta.pk.name, *columns)
+    return queryset
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,16 +80,17 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ("id", "code", "title")
 
 
-class PostListSerializer(serializers.ModelSerializer):
-    author = serializers.StringRelatedField()
+class PostListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source="post_id", read_only=True)
+    author = serializers.CharField(source="author_username", read_only=True)
     category = CategorySerializer()
 
     class Meta:
-        model = Post
+        model = PostSummary
         fields = ("id", "title", "excerpt", "author", "category", "created_at", "published")
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField()
 
     class Meta:
@@ -32,7 +104,15 @@ class PostCreateSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "body", "category", "published")
 
 
-class ReplySerializer(serializers.ModelSerializer):
+class PostRankSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="post_id", read_only=True)
+
+    class Meta:
+        model = PostRank
+        fields = ("id", "title", "category", "score", "hot_score")
+
+
+class ReplySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
 
     class Meta:
@@ -45,4 +125,46 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = ("id","user","category","created_at")
-        read_only_fields = ("user","created_at")
\ No newline at end of file
+        read_only_fields = ("user","created_at")
+
+
+class SubscriptionBulkSerializer(serializers.Serializer):
+    subscribe = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=1000)
+    unsubscribe = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=1000)
+
+    def validate(self, attrs):
+        if not (attrs["subscribe"] or attrs["unsubscribe"]):
+            raise serializers.ValidationError("Укажите subscribe или unsubscribe.")
+        if set(attrs["subscribe"]) & set(attrs["unsubscribe"]):
+            raise serializers.ValidationError("Категория не может быть в subscribe и unsubscribe одновременно.")
+        return attrs
+
+
+class ReplyBulkSerializer(serializers.Serializer):
+    accept = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=1000)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=1000)
+
+    def validate(self, attrs):
+        if not (attrs["accept"] or attrs["delete"]):
+            raise serializers.ValidationError("Укажите accept или delete.")
+        if set(attrs["accept"]) & set(attrs["delete"]):
+            raise serializers.ValidationError("Отклик не может быть в accept и delete одновременно.")
+        return attrs
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ("id", "message", "url", "created_at", "read")
+        read_only_fields = fields
+
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    all = serializers.BooleanField(required=False, default=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if not (attrs.get("all") or attrs.get("ids") or attrs.get("before")):
+            raise serializers.ValidationError("Укажите all, ids или before.")
+        return attrs
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Reply
+from .signals import replies_accepted, replies_deleted
+
+
+def accept_replies(replies):
+    """
+    Принимает отклики из queryset'а одним UPDATE.
+    Возвращает только те, что действительно сменили статус.
+    """
+    with transaction.atomic():
+        changed = list(
+            replies.select_for_update(of=("self",))
+            .select_related("post", "author")
+            .filter(accepted=False, deleted=False)
+        )
+        if changed:
+            now = timezone.now()
+            Reply.objects.filter(pk__in=[r.pk for r in changed]).update(accepted=True, accepted_at=now)
+            for reply in changed:
+                reply.accepted = True
+                reply.accepted_at = now
+            replies_accepted.send(sender=Reply, replies=changed)
+    return changed
+
+
+def soft_delete_replies(replies):
+    """Помечает отклики удалёнными одним UPDATE, возвращает изменённые"""
+    with transaction.atomic():
+        changed = list(
+            replies.select_for_update(of=("self",))
+            .select_related("post", "author")
+            .filter(deleted=False)
+        )
+        if changed:
+            Reply.objects.filter(pk__in=[r.pk for r in changed]).update(deleted=True)
+            for reply in changed:
+                reply.deleted = True
+            replies_deleted.send(sender=Reply, replies=changed)
+    return changed
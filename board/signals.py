@@ -1,10 +1,32 @@
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
 from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .choices import DIGEST_IMMEDIATE
+from .models import Reply, Post, Notification, PostSummary, Category
+from . import fanout, outbox, ranking, reputation, stats
+from .cache import bump as bump_generation, post_generation
+from .notifications import adjust_unread, digest_modes, notification_event, notify_many
+from .push import push
+from .search import get_backend as get_search_backend
+
+# Массовые события откликов (см. board.services), аргумент replies — список Reply
+replies_accepted = Signal()
+replies_deleted = Signal()
 
-from .models import Reply, Post, Subscription, Notification
+
+def _bump_post_counters(replies, **deltas):
+    """Сдвигает счётчики постов на delta за каждый отклик, одним UPDATE на пост"""
+    for post_id, n in Counter(r.post_id for r in replies).items():
+        Post.objects.filter(pk=post_id).update(
+            **{field: F(field) + delta * n for field, delta in deltas.items()}
+        )
 
 
 @receiver(post_save, sender=Reply)
@@ -12,7 +34,9 @@ def notify_author_on_reply(sender, instance: Reply, created, **kwargs):
     if not created:
         return
     post = instance.post
-    if post.author.email:
+    # при режиме сводки письмо уйдёт позже в дайджесте (board.digests)
+    immediate = digest_modes([post.author_id])[post.author_id] == DIGEST_IMMEDIATE
+    if immediate and post.author.email:
         subject = f"Новый отклик на ваше объявление: {post.title}"
         html = render_to_string("emails/new_reply.html", {
             "post": post,
@@ -20,55 +44,268 @@ def notify_author_on_reply(sender, instance: Reply, created, **kwargs):
             "site": settings.SITE_URL,
         })
         text = f"Новый отклик на объявление: {post.title}\n\n{instance.text}\n{settings.SITE_URL}/posts/{post.pk}/#replies"
-        msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [post.author.email])
-        msg.attach_alternative(html, "text/html")
-        msg.send(fail_silently=True)
+        outbox.enqueue(subject, text, [post.author.email], html=html)
 
     Notification.objects.create(
         user=post.author,
         message=f"Новый отклик на '{post.title}'",
-        url=f"/posts/{post.pk}/#replies"
+        url=f"/posts/{post.pk}/#replies",
+        emailed_at=timezone.now() if immediate else None,
+    )
+    push(post.author_id, {"type": "reply", "post": post.pk, "reply": instance.pk})
+
+
+@receiver(replies_accepted)
+def notify_when_reply_accepted(sender, replies, **kwargs):
+    # массовое принятие — одним INSERT писем и одним INSERT уведомлений
+    emails, notifications = [], []
+    modes = digest_modes({instance.author_id for instance in replies})
+    now = timezone.now()
+    for instance in replies:
+        if instance.author.email:
+            immediate = modes[instance.author_id] == DIGEST_IMMEDIATE
+            if immediate:
+                subject = f"Ваш отклик был принят: {instance.post.title}"
+                html = render_to_string("emails/reply_accepted.html", {
+                    "post": instance.post,
+                    "reply": instance,
+                    "site": settings.SITE_URL,
+                })
+                text = f"Ваш отклик принят для объявления: {instance.post.title}\n{settings.SITE_URL}/posts/{instance.post.pk}/#replies"
+                emails.append((subject, text, instance.author.email, html))
+
+            notifications.append(Notification(
+                user=instance.author,
+                message=f"Ваш отклик принят: '{instance.post.title}'",
+                url=f"/posts/{instance.post.pk}/#replies",
+                emailed_at=now if immediate else None,
+            ))
+    outbox.enqueue_many(emails)
+    notify_many(notifications)
+
+
+@receiver(post_save, sender=Post)
+def notify_subscribers_on_new_post(sender, instance: Post, created, raw=False, **kwargs):
+    # подписчиков может быть десятки тысяч — рассылка уходит в Celery пачками (board.fanout)
+    if created and not raw:
+        fanout.schedule(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_summary(sender, instance: Post, raw=False, **kwargs):
+    if raw:
+        return
+    PostSummary.build(instance).save()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def sync_summary_author(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # вход в систему сохраняет только last_login — проекцию не трогаем
+    if raw or created or (update_fields is not None and "username" not in update_fields):
+        return
+    renamed = list(
+        PostSummary.objects.filter(author=instance).exclude(author_username=instance.username)
+        .values_list("pk", flat=True)
     )
+    if renamed:
+        PostSummary.objects.filter(pk__in=renamed).update(author_username=instance.username)
+        bump_generation("posts", *map(post_generation, renamed))
+    # имя автора отклика есть на странице поста, во фрагменте откликов и в ETag;
+    # старого имени у откликов не сохранено, поэтому сдвигаются все посты с его откликами
+    replied = Reply.objects.filter(author=instance).values_list("post_id", flat=True).distinct()
+    bump_generation(*map(post_generation, replied))
+
+
+@receiver(post_save, sender=Category)
+def sync_summary_category(sender, instance: Category, raw=False, **kwargs):
+    if raw:
+        return
+    PostSummary.objects.filter(category=instance).exclude(
+        category_title=instance.title
+    ).update(category_title=instance.title)
+
+
+@receiver(post_save, sender=Post)
+def index_post_for_search(sender, instance: Post, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_search(sender, instance: Post, **kwargs):
+    get_search_backend().remove_post(instance.pk)
 
 
 @receiver(post_save, sender=Reply)
-def notify_when_reply_accepted(sender, instance: Reply, created, **kwargs):
-    if created:
+def count_new_reply(sender, instance: Reply, created, raw=False, **kwargs):
+    if not created or raw:
         return
-    if instance.accepted and instance.author.email:
-        subject = f"Ваш отклик был принят: {instance.post.title}"
-        html = render_to_string("emails/reply_accepted.html", {
-            "post": instance.post,
-            "reply": instance,
-            "site": settings.SITE_URL,
-        })
-        text = f"Ваш отклик принят для объявления: {instance.post.title}\n{settings.SITE_URL}/posts/{instance.post.pk}/#replies"
-        msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [instance.author.email])
-        msg.attach_alternative(html, "text/html")
-        msg.send(fail_silently=True)
-
-        Notification.objects.create(
-            user=instance.author,
-            message=f"Ваш отклик принят: '{instance.post.title}'",
-            url=f"/posts/{instance.post.pk}/#replies"
-        )
+    _bump_post_counters(
+        [instance],
+        reply_count=1,
+        live_reply_count=0 if instance.deleted else 1,
+        accepted_count=1 if instance.accepted and not instance.deleted else 0,
+    )
+
+
+@receiver(replies_accepted)
+def count_accepted_replies(sender, replies, **kwargs):
+    _bump_post_counters(replies, accepted_count=1)
+
+
+@receiver(replies_deleted)
+def count_deleted_replies(sender, replies, **kwargs):
+    _bump_post_counters(replies, live_reply_count=-1)
+    _bump_post_counters([r for r in replies if r.accepted], accepted_count=-1)
+
+
+@receiver(post_delete, sender=Reply)
+def uncount_removed_reply(sender, instance: Reply, origin=None, **kwargs):
+    # жёсткое удаление (API); soft-delete идёт через replies_deleted
+    if isinstance(origin, Post) or getattr(origin, "model", None) is Post:
+        return  # пост удаляется целиком, его счётчики уже не нужны
+    live = not instance.deleted
+    _bump_post_counters(
+        [instance],
+        reply_count=-1,
+        live_reply_count=-1 if live else 0,
+        accepted_count=-1 if live and instance.accepted else 0,
+    )
 
 
 @receiver(post_save, sender=Post)
-def notify_subscribers_on_new_post(sender, instance: Post, created, **kwargs):
-    if not created:
+def rank_post(sender, instance: Post, created, raw=False, **kwargs):
+    if raw:
+        return
+    ranking.sync_post(instance, created=created)
+
+
+@receiver(post_save, sender=Reply)
+def rank_new_reply(sender, instance: Reply, created, raw=False, **kwargs):
+    if created and not raw and not instance.deleted:
+        ranking.bump([instance.post_id], ranking.RANKING["reply_weight"])
+
+
+@receiver(replies_accepted)
+def rank_accepted_replies(sender, replies, **kwargs):
+    ranking.bump([r.post_id for r in replies], ranking.RANKING["accept_weight"])
+
+
+@receiver(replies_deleted)
+def rank_deleted_replies(sender, replies, **kwargs):
+    ranking.retract(replies)
+
+
+@receiver(post_delete, sender=Reply)
+def unrank_removed_reply(sender, instance: Reply, origin=None, **kwargs):
+    if instance.deleted or isinstance(origin, Post) or getattr(origin, "model", None) is Post:
+        return
+    ranking.retract([instance])
+
+
+def _deleted_with(origin, model):
+    return isinstance(origin, model) or getattr(origin, "model", None) is model
+
+
+# репутация начисляется периодически (board.reputation), удаления снимают уже начисленное
+@receiver(replies_deleted)
+def retract_deleted_replies(sender, replies, **kwargs):
+    reputation.retract(replies)
+
+
+@receiver(post_delete, sender=Reply)
+def retract_removed_reply(sender, instance: Reply, origin=None, **kwargs):
+    # отклики удаляемого поста снимаются пачкой в retract_post_replies;
+    # при удалении пользователя репутацию поправит еженедельный пересчёт
+    if instance.deleted or _deleted_with(origin, Post) or _deleted_with(origin, get_user_model()):
         return
-    subs = Subscription.objects.filter(category=instance.category).select_related("user")
-    recipients = [s.user.email for s in subs if s.user.email]
-    if not recipients:
+    reputation.retract([instance])
+
+
+@receiver(pre_delete, sender=Post)
+def retract_post_replies(sender, instance: Post, origin=None, **kwargs):
+    if not _deleted_with(origin, get_user_model()):
+        reputation.retract(instance.replies.filter(deleted=False))
+
+
+@receiver(post_save, sender=Post)
+def count_author_post(sender, instance: Post, created, raw=False, **kwargs):
+    if not raw:
+        stats.post_saved(instance, created=created)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance: Post, origin=None, **kwargs):
+    if _deleted_with(origin, get_user_model()):
+        return  # статистика удаляется вместе с пользователем
+    # последний пост и топ категорий проще пересчитать, удаление редкое
+    stats.rebuild([instance.author_id])
+
+
+@receiver(post_save, sender=Category)
+def sync_stats_category(sender, instance: Category, created, raw=False, **kwargs):
+    if created or raw:
         return
-    subject = f"Новая публикация в вашей категории: {instance.title}"
-    html = render_to_string("emails/new_post_newsletter.html", {
-        "post": instance,
-        "excerpt": instance.excerpt(),
-        "site": settings.DEFAULT_FROM_EMAIL,
-    })
-    text = f"{instance.title}\n\n{instance.excerpt()}"
-    msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, recipients)
-    msg.attach_alternative(html, "text/html")
-    msg.send(fail_silently=True)
+    # название категории хранится в top_categories авторов
+    stats.rebuild(Post.objects.filter(category=instance).values("author_id"))
+
+
+@receiver(post_save, sender=Reply)
+def count_author_reply(sender, instance: Reply, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.replies_added([instance])
+
+
+@receiver(replies_accepted)
+def count_author_accepted(sender, replies, **kwargs):
+    stats.replies_accepted(replies)
+
+
+@receiver(post_delete, sender=Reply)
+def uncount_author_reply(sender, instance: Reply, origin=None, **kwargs):
+    post_author_id = None
+    # при удалении поста принятые пересчитает uncount_author_post
+    if instance.accepted and not _deleted_with(origin, Post):
+        post_author_id = Post.objects.filter(pk=instance.post_id).values_list("author_id", flat=True).first()
+    stats.reply_removed(instance, post_author_id)
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance: Notification, created, raw=False, **kwargs):
+    if created and not raw and not instance.read:
+        adjust_unread(instance.user_id, 1)
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance: Notification, created, raw=False, **kwargs):
+    if created and not raw:
+        push(instance.user_id, notification_event(instance))
+
+
+# поколения кэша страниц (board.cache): правка → старые ключи больше не читаются
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance: Post, raw=False, **kwargs):
+    if not raw:
+        bump_generation("posts", "ranking", post_generation(instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance: Category, raw=False, **kwargs):
+    if not raw:
+        bump_generation("categories")
+
+
+@receiver(post_save, sender=Reply)
+@receiver(post_delete, sender=Reply)
+def invalidate_reply_pages(sender, instance: Reply, raw=False, **kwargs):
+    if not raw:
+        bump_generation("ranking", post_generation(instance.post_id))
+
+
+@receiver(replies_accepted)
+@receiver(replies_deleted)
+def invalidate_replies_pages(sender, replies, **kwargs):
+    bump_generation("ranking", *{post_generation(r.post_id) for r in replies})
@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Post, Reply
+
+TOP_CATEGORIES = 5
+
+STATS_FIELDS = [
+    "post_count", "reply_count", "accepted_replies",
+    "last_post", "last_post_title", "last_post_created_at", "top_categories",
+]
+
+
+def _top_categories(author_ids):
+    """author_id → [{"title", "count"}] самых частых категорий, одним GROUP BY"""
+    rows = (
+        Post.objects.filter(author_id__in=author_ids)
+        .values("author_id", "category__title")
+        .annotate(total=Count("id"))
+        .order_by("author_id", "-total", "category__title")
+    )
+    top = defaultdict(list)
+    for row in rows:
+        if len(top[row["author_id"]]) < TOP_CATEGORIES:
+            top[row["author_id"]].append({"title": row["category__title"], "count": row["total"]})
+    return top
+
+
+def _counts(queryset, field, author_ids):
+    return dict(
+        queryset.filter(**{f"{field}__in": author_ids})
+        .values_list(field)
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+
+
+def _build(author_ids):
+    latest = Post.objects.filter(author=OuterRef("pk")).order_by("-created_at", "-pk").values("pk")[:1]
+    last_ids = dict(get_user_model().objects.filter(pk__in=author_ids).annotate(last=Subquery(latest)).values_list("pk", "last"))
+    last_posts = Post.objects.only("title", "created_at").in_bulk([pk for pk in last_ids.values() if pk])
+    posts = _counts(Post.objects.all(), "author_id", author_ids)
+    replies = _counts(Reply.objects.all(), "author_id", author_ids)
+    accepted = _counts(Reply.objects.filter(accepted=True), "post__author_id", author_ids)
+    top = _top_categories(author_ids)
+
+    rows = []
+    for author_id, last_id in last_ids.items():
+        last = last_posts.get(last_id)
+        rows.append(AuthorStats(
+            user_id=author_id,
+            post_count=posts.get(author_id, 0),
+            reply_count=replies.get(author_id, 0),
+            accepted_replies=accepted.get(author_id, 0),
+            last_post=last,
+            last_post_title=last.title if last else "",
+            last_post_created_at=last.created_at if last else None,
+            top_categories=top.get(author_id, []),
+        ))
+    AuthorStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=["user"], update_fields=STATS_FIELDS,
+    )
+    return len(rows)
+
+
+def rebuild(author_ids=None, batch_size=1000):
+    """Полный пересчёт статистики (всех авторов или перечисленных), пачками"""
+    users = get_user_model().objects.order_by("pk").values_list("pk", flat=True)
+    if author_ids is not None:
+        users = users.filter(pk__in=author_ids)
+    total, batch = 0, []
+    for pk in users.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            total += _build(batch)
+            batch = []
+    if batch:
+        total += _build(batch)
+    return total
+
+
+def for_user(user):
+    """Строка статистики пользователя; нет её — считается один раз"""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        rebuild([user.pk])
+        return AuthorStats.objects.get(user=user)
+
+
+def _update(author_id, **fields):
+    if not AuthorStats.objects.filter(user_id=author_id).update(**fields):
+        rebuild([author_id])
+
+
+def _shift(author_counts, field, sign=1):
+    for author_id, n in author_counts.items():
+        _update(author_id, **{field: Greatest(F(field) + sign * n, Value(0))})
+
+
+def post_saved(post, created=False):
+    if created:
+        _shift({post.author_id: 1}, "post_count")
+        # последний пост меняется, только если новый не старше записанного
+        AuthorStats.objects.filter(
+            Q(last_post_created_at__isnull=True) | Q(last_post_created_at__lte=post.created_at),
+            user_id=post.author_id,
+        ).update(last_post=post, last_post_title=post.title, last_post_created_at=post.created_at)
+    else:
+        AuthorStats.objects.filter(user_id=post.author_id, last_post=post).update(last_post_title=post.title)
+    # категория могла смениться — топ пересчитываем по постам этого автора
+    AuthorStats.objects.filter(user_id=post.author_id).update(
+        top_categories=_top_categories([post.author_id]).get(post.author_id, [])
+    )
+
+
+def replies_added(replies):
+    _shift(Counter(r.author_id for r in replies), "reply_count")
+    _shift(Counter(r.post.author_id for r in replies if r.accepted), "accepted_replies")
+
+
+def replies_accepted(replies):
+    _shift(Counter(r.post.author_id for r in replies), "accepted_replies")
+
+
+def reply_removed(reply, post_author_id=None):
+    _shift({reply.author_id: 1}, "reply_count", -1)
+    if reply.accepted and post_author_id is not None:
+        _shift({post_author_id: 1}, "accepted_replies", -1)
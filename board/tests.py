@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import asyncio
+import json
+import re
+import warnings
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone, translation
+from kombu.exceptions import OperationalError
+
+from appointment import tasks
+from board import db, digests, fanout, newsletters, notifications, outbox, push, ranking, reputation, stats, views
+from board.cache import post_validators
+from board.choices import DIGEST_DAILY, DIGEST_HOURLY, OUTBOX_FAILED, OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT
+from board.models import (
+    Author, AuthorStats, Category, Newsletter, NewsletterDelivery, NewsletterSubscription, Notification, OutgoingEmail,
+    Post, PostRank, PostSummary, RankingWatermark, Reply, ReputationWatermark, Subscription,
+)
+from board.notifications import notification_event, notify_many, unread_count
+from board.pagination import encode_cursor, pk_ranges
+from board.ranking import decay
+from board.search import search_post_ids
+from board.services import accept_replies, soft_delete_replies
+
+User = get_user_model()
+
+# справочник категорий маленький, его полное чтение ожидаемо
+ALLOWED_SCANS = {"board_category"}
+
+# старые SQLite пишут "SCAN TABLE x", новые — "SCAN x"; "SCAN x USING INDEX" — проход по индексу
+SQLITE_SCAN = re.compile(r"SCAN (?:TABLE )?(\w+)(?: AS \w+)?")
+POSTGRES_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def full_scans(sql):
+    """Таблицы, которые план запроса читает целиком"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+            return {m.group(1) for m in map(SQLITE_SCAN.fullmatch, details) if m}
+        # на маленьких тестовых таблицах PostgreSQL и так выбрал бы Seq Scan
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {sql}")
+        return set(POSTGRES_SEQ_SCAN.findall("\n".join(row[0] for row in cursor.fetchall())))
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "EXPLAIN разбирается только для SQLite и PostgreSQL")
+class QueryPlanTests(TestCase):
+    """Горячие запросы не должны скатываться в полный проход по таблице"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", email="author@example.com", password="x")
+        cls.reader = User.objects.create_user("reader", email="reader@example.com", password="x")
+        cls.category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=cls.category, title="Ищу танка", body="текст")
+        cls.reply = Reply.objects.create(post=cls.post, author=cls.reader, text="Я танк")
+        Subscription.objects.create(user=cls.reader, category=cls.category)
+        NewsletterSubscription.objects.create(user=cls.reader, digest="hourly")
+        Notification.objects.create(user=cls.author, message="Новый отклик")
+        ReputationWatermark.objects.create(pk=1, computed_at=timezone.now() - timedelta(hours=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def assertIndexed(self, func, *args, **kwargs):
+        """Вызывает func и проверяет план каждого выполненного запроса"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = func(*args, **kwargs)
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            scans = full_scans(sql) - ALLOWED_SCANS
+            self.assertFalse(scans, f"Полный проход по {', '.join(sorted(scans))}:\n{sql}")
+        return result
+
+    def assertPagesIndexed(self, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assertIndexed(self.client.get, url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_detects_full_scan(self):
+        # body не индексируется — проверка самого детектора
+        self.assertEqual(full_scans("SELECT id FROM board_post WHERE body = 'текст'"), {"board_post"})
+
+    def test_public_pages(self):
+        self.assertPagesIndexed([
+            "/",
+            "/posts/",
+            f"/posts/{self.post.pk}/",
+            f"/posts/{self.post.pk}/replies/",
+            "/ranking/",
+            f"/ranking/?sort=top&category={self.category.pk}",
+            f"/auth/profile/{self.author.pk}/",
+        ])
+
+    def test_owner_pages(self):
+        self.client.force_login(self.author)
+        today = timezone.localdate()
+        self.assertPagesIndexed([
+            f"/posts/{self.post.pk}/",
+            "/my-posts/",
+            "/my-replies/",
+            f"/my-replies/?post={self.post.pk}&accepted=0&date_from={today}&date_to={today}&order=asc",
+            "/my-replies/posts/?q=танк",
+            "/notifications/",
+            "/auth/profile/edit/",
+        ])
+
+    def test_api(self):
+        self.client.force_login(self.author)
+        self.assertPagesIndexed([
+            "/api/posts/",
+            f"/api/posts/{self.post.pk}/",
+            "/api/replies/",
+            "/api/ranking/",
+            "/api/notifications/",
+            "/api/subscriptions/",
+        ])
+
+    def test_newsletter_tasks(self):
+        with mock.patch.object(tasks, "chord"):
+            self.assertIndexed(tasks.send_weekly_newsletter)
+        self.assertIndexed(tasks.send_newsletter_chunk, "Тема", "текст", "<p>текст</p>", 0, self.reader.pk)
+
+    def test_fan_out_tasks(self):
+        with mock.patch.object(tasks, "group"):
+            self.assertIndexed(tasks.fan_out_post, self.post.pk)
+        self.assertIndexed(tasks.fan_out_post_chunk, self.post.pk, 0, 10 ** 6)
+
+    def test_periodic_tasks(self):
+        for task, args in [
+            (tasks.send_notification_digests, ("hourly",)),
+            (tasks.drain_outbox, ()),
+            (tasks.reconcile_unread_notifications, ()),
+            (tasks.purge_old_notifications, ()),
+            (tasks.decay_post_ranking, ()),
+            (tasks.decay_post_ranking, ()),
+            (tasks.update_reputation, ()),
+        ]:
+            with self.subTest(task=task.name):
+                self.assertIndexed(task, *args)
+
+
+class PostCounterTests(TestCase):
+    """Счётчики откликов поста поддерживаются сигналами и чинятся командой recount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        cls.post = Post.objects.create(
+            author=cls.author, category=Category.objects.create(code="Tank", title="Танк"), title="Ищу танка", body="текст",
+        )
+
+    def counters(self):
+        return Post.objects.values_list(*Post.COUNTER_FIELDS).get(pk=self.post.pk)
+
+    def test_reply_accept_delete(self):
+        replies = [Reply.objects.create(post=self.post, author=self.replier, text="Я") for _ in range(3)]
+        self.assertEqual(self.counters(), (3, 3, 0))
+
+        accept_replies(Reply.objects.filter(pk__in=[replies[0].pk, replies[1].pk]))
+        # повторное принятие ничего не меняет
+        accept_replies(Reply.objects.filter(pk=replies[0].pk))
+        self.assertEqual(self.counters(), (3, 3, 2))
+
+        soft_delete_replies(Reply.objects.filter(pk__in=[replies[0].pk, replies[2].pk]))
+        soft_delete_replies(Reply.objects.filter(pk=replies[0].pk))
+        self.assertEqual(self.counters(), (3, 1, 1))
+
+        Reply.objects.get(pk=replies[0].pk).delete()  # уже снятый отклик
+        self.assertEqual(self.counters(), (2, 1, 1))
+        Reply.objects.get(pk=replies[1].pk).delete()  # живой принятый
+        self.assertEqual(self.counters(), (1, 0, 0))
+
+    def test_recount_repairs_drift(self):
+        reply = Reply.objects.create(post=self.post, author=self.replier, text="Я")
+        accept_replies(Reply.objects.filter(pk=reply.pk))
+        Reply.objects.create(post=self.post, author=self.replier, text="Я", deleted=True)
+        Post.objects.filter(pk=self.post.pk).update(reply_count=7, live_reply_count=0, accepted_count=5)
+
+        out = StringIO()
+        call_command("recount", batch_size=1, stdout=out)
+        self.assertEqual(self.counters(), (2, 1, 1))
+        self.assertIn("repaired 1", out.getvalue())
+
+
+class FanOutTests(TestCase):
+    """Рассылка о новом посте подписчикам категории"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(code="Tank", title="Танк")
+        other = Category.objects.create(code="Healer", title="Хил")
+        cls.author = User.objects.create_user("author", email="author@example.com")
+        cls.active = [User.objects.create_user(f"user{i}", email=f"user{i}@example.com") for i in range(3)]
+        cls.inactive = User.objects.create_user("inactive", email="inactive@example.com", is_active=False)
+        cls.digest = User.objects.create_user("digest", email="digest@example.com")
+        cls.no_email = User.objects.create_user("no_email")
+        cls.other = User.objects.create_user("other", email="other@example.com")
+        NewsletterSubscription.objects.create(user=cls.digest, digest=DIGEST_HOURLY)
+        for user in [cls.author, *cls.active, cls.inactive, cls.digest, cls.no_email]:
+            Subscription.objects.create(user=user, category=cls.category)
+        Subscription.objects.create(user=cls.other, category=other)
+        cls.post = Post.objects.create(author=cls.author, category=cls.category, title="Ищу танка", body="текст")
+
+    def test_recipients(self):
+        recipients = set(fanout.subscriptions(self.post).values_list("user_id", flat=True))
+        self.assertEqual(recipients, {user.pk for user in [*self.active, self.digest, self.no_email]})
+
+    def test_chunk_boundaries(self):
+        pks = list(fanout.subscriptions(self.post).values_list("pk", flat=True))
+        ranges = list(fanout.chunks(self.post, chunk_size=2))
+        self.assertEqual(ranges, [(pks[0], pks[1]), (pks[2], pks[3]), (pks[4], pks[4])])
+
+        sent = failed = 0
+        for first_pk, last_pk in ranges:
+            chunk_sent, chunk_failed = fanout.deliver_chunk(self.post.pk, first_pk, last_pk)
+            sent, failed = sent + chunk_sent, failed + chunk_failed
+        # пачки не пересекаются: по одному уведомлению и письму на подписчика
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [user.email for user in self.active])
+        notified = Notification.objects.filter(url=f"/posts/{self.post.pk}/")
+        self.assertEqual(
+            sorted(notified.values_list("user_id", flat=True)),
+            sorted(user.pk for user in [*self.active, self.digest, self.no_email]),
+        )
+        # подписчик со сводкой получит пост в дайджесте
+        self.assertEqual(list(notified.filter(emailed_at__isnull=True).values_list("user_id", flat=True)), [self.digest.pk])
+
+    def test_broker_outage_does_not_block_post_creation(self):
+        self.client.force_login(self.author)
+        data = {"title": "Ищу хила", "category": self.category.pk, "body": "текст", "published": "on"}
+        with mock.patch.object(tasks.fan_out_post, "apply_async", side_effect=OperationalError) as apply_async:
+            with self.assertLogs("board.fanout", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/posts/create/", data)
+        post = Post.objects.get(title="Ищу хила")
+        self.assertRedirects(response, f"/posts/{post.pk}/", fetch_redirect_response=False)
+        apply_async.assert_called_once_with((post.pk,), retry=False, ignore_result=True)
+
+    def test_deleted_post(self):
+        first_pk, last_pk = next(fanout.chunks(self.post))
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(fanout.deliver_chunk(self.post.pk, first_pk, last_pk), (0, 0))
+
+
+class DigestTests(TestCase):
+    """Сводки: по письму на пользователя с режимом, уведомления помечаются отправленными"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hourly = User.objects.create_user("hourly", email="hourly@example.com")
+        cls.daily = User.objects.create_user("daily", email="daily@example.com")
+        cls.no_email = User.objects.create_user("no_email")
+        cls.inactive = User.objects.create_user("inactive", email="inactive@example.com", is_active=False)
+        for user, mode in [
+            (cls.hourly, DIGEST_HOURLY), (cls.daily, DIGEST_DAILY),
+            (cls.no_email, DIGEST_HOURLY), (cls.inactive, DIGEST_HOURLY),
+        ]:
+            NewsletterSubscription.objects.create(user=user, digest=mode)
+            for i in range(3):
+                Notification.objects.create(user=user, message=f"Событие {i}", url=f"/posts/{i}/")
+        Notification.objects.create(user=cls.hourly, message="Уже в письме", emailed_at=timezone.now())
+
+    def pending(self, user):
+        return Notification.objects.filter(user=user, emailed_at__isnull=True).count()
+
+    def test_groups_per_user_and_marks_emailed(self):
+        with mock.patch.object(outbox, "schedule_drain"):
+            self.assertEqual(digests.send(DIGEST_HOURLY, batch_size=1), 1)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, self.hourly.email)
+        self.assertIn("3 новых событий", email.subject)
+        self.assertNotIn("Уже в письме", email.body)
+        for i in range(3):
+            self.assertIn(f"Событие {i}", email.body)
+
+        self.assertEqual(self.pending(self.hourly), 0)
+        # без адреса письма нет, но события не копятся
+        self.assertEqual(self.pending(self.no_email), 0)
+        self.assertEqual(self.pending(self.daily), 3)
+        self.assertEqual(self.pending(self.inactive), 3)
+        # повторный запуск ничего не шлёт
+        self.assertEqual(digests.send(DIGEST_HOURLY), 0)
+
+    def test_long_digest_is_truncated(self):
+        with mock.patch.object(digests, "MAX_ITEMS", 2), mock.patch.object(outbox, "schedule_drain"):
+            self.assertEqual(digests.send(DIGEST_DAILY), 1)
+        email = OutgoingEmail.objects.get()
+        self.assertIn("Событие 2", email.body)
+        self.assertNotIn("Событие 0", email.body)
+        self.assertIn("и ещё 1", email.body)
+
+
+class CursorTests(TestCase):
+    """Подделанный ?cursor= не должен ронять страницы со списками"""
+
+    BAD_CURSORS = [
+        "не-base64",
+        encode_cursor({"created_at": 1}),
+        encode_cursor([1]),
+        encode_cursor(["вчера", 1]),
+        encode_cursor(["2026-01-01T00:00:00+00:00", "x"]),
+        encode_cursor([[1], {"pk": 1}]),
+        encode_cursor([None, 1]),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", email="author@example.com", password="x")
+        cls.category = Category.objects.create(code="Tank", title="Танк")
+        cls.posts = [
+            Post.objects.create(author=cls.author, category=cls.category, title=f"Пост {i}", body="текст")
+            for i in range(3)
+        ]
+        Reply.objects.create(post=cls.posts[0], author=cls.author, text="Я танк")
+        Notification.objects.create(user=cls.author, message="Новый отклик")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def test_api_rejects_bad_cursor(self):
+        for url in ["/api/posts/", "/api/replies/", "/api/ranking/", "/api/notifications/"]:
+            for cursor in self.BAD_CURSORS:
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 400)
+
+    def test_pages_show_first_page_for_bad_cursor(self):
+        for url in ["/", "/posts/", f"/posts/{self.posts[0].pk}/replies/", "/my-replies/", "/ranking/", "/notifications/"]:
+            for cursor in self.BAD_CURSORS:
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 200)
+
+    def test_valid_cursor(self):
+        newest = max(self.posts, key=lambda post: (post.created_at, post.pk))
+        response = self.client.get("/api/posts/", {"cursor": encode_cursor([newest.created_at, newest.pk])})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(newest.pk, [post["id"] for post in response.json()["results"]])
+        self.assertEqual(len(response.json()["results"]), 2)
+
+
+class ReplyLoadMoreTests(TestCase):
+    """Кнопка «Показать ещё» на странице поста: порции откликов по курсору"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=category, title="Ищу танка", body="текст")
+        cls.replies = [
+            Reply.objects.create(post=cls.post, author=cls.replier, text=f"Отклик {i}")
+            for i in range(views.REPLIES_PER_PAGE + 5)
+        ]
+        # одинаковое время: порядок внутри держится на pk
+        Reply.objects.filter(pk__in=[r.pk for r in cls.replies[15:25]]).update(created_at=cls.replies[15].created_at)
+        cls.replies[3].deleted = True
+        cls.replies[3].save()
+
+    def setUp(self):
+        cache.clear()
+
+    def reply_ids(self, html):
+        return [int(pk) for pk in re.findall(r'data-reply-id="(\d+)"', html)]
+
+    def test_pages_follow_next_link(self):
+        url, seen = f"/posts/{self.post.pk}/replies/", []
+        while url:
+            data = self.client.get(url).json()
+            seen += self.reply_ids(data["html"])
+            self.assertEqual(data["has_next"], data["next"] is not None)
+            url = data["next"]
+        self.assertEqual(seen, [r.pk for r in self.replies if not r.deleted])
+
+    def test_first_page_and_button(self):
+        data = self.client.get(f"/posts/{self.post.pk}/replies/").json()
+        self.assertEqual(len(self.reply_ids(data["html"])), views.REPLIES_PER_PAGE)
+        self.assertTrue(data["next"].startswith(f"/posts/{self.post.pk}/replies/?cursor="))
+        # на странице поста та же первая порция и ссылка кнопки
+        page = self.client.get(f"/posts/{self.post.pk}/").content.decode()
+        self.assertEqual(self.reply_ids(page), self.reply_ids(data["html"]))
+        self.assertIn(f'data-url="{data["next"]}"', page)
+
+    def test_bad_cursor_gives_first_page(self):
+        first = self.client.get(f"/posts/{self.post.pk}/replies/").json()
+        for cursor in CursorTests.BAD_CURSORS:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f"/posts/{self.post.pk}/replies/", {"cursor": cursor}).json(), first)
+
+    def test_missing_post(self):
+        self.assertEqual(self.client.get("/posts/0/replies/").status_code, 404)
+
+
+class MyRepliesTests(TestCase):
+    """«Мои отклики»: фильтры, сортировка по числу откликов поста и подсказки постов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="x")
+        cls.replier = User.objects.create_user("replier")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.busy, cls.quiet, cls.middle = [
+            Post.objects.create(author=cls.owner, category=category, title=title, body="текст")
+            for title in ["Ищу танка", "Ищу хила", "Рейд в субботу"]
+        ]
+        foreign = Post.objects.create(author=cls.replier, category=category, title="Чужой пост", body="текст")
+        day = timezone.now() - timedelta(days=10)
+        cls.replies = {}
+        for i, post in enumerate([cls.busy, cls.busy, cls.busy, cls.middle, cls.middle, cls.quiet]):
+            reply = Reply.objects.create(post=post, author=cls.replier, text=f"Отклик {i}")
+            Reply.objects.filter(pk=reply.pk).update(created_at=day + timedelta(days=i))
+            cls.replies[i] = reply
+        Reply.objects.create(post=foreign, author=cls.owner, text="Я танк")
+        soft_delete_replies(Reply.objects.filter(pk=Reply.objects.create(post=cls.busy, author=cls.replier, text="x").pk))
+        accept_replies(Reply.objects.filter(pk=cls.replies[5].pk))
+        cls.day = day
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def ids(self, **params):
+        response = self.client.get("/my-replies/", params)
+        self.assertEqual(response.status_code, 200)
+        return [reply.pk for reply in response.context["replies"]], response
+
+    def pks(self, *indexes):
+        return [self.replies[i].pk for i in indexes]
+
+    def test_ordering_by_post_reply_count(self):
+        # внутри поста — новые сверху
+        self.assertEqual(self.ids()[0], self.pks(2, 1, 0, 4, 3, 5))
+        self.assertEqual(self.ids(order="asc")[0], self.pks(5, 4, 3, 2, 1, 0))
+
+    def test_filters(self):
+        self.assertEqual(self.ids(post=self.middle.pk)[0], self.pks(4, 3))
+        self.assertEqual(self.ids(accepted="1")[0], self.pks(5))
+        self.assertEqual(self.ids(accepted="0", order="asc")[0], self.pks(4, 3, 2, 1, 0))
+        date_from, date_to = (self.day + timedelta(days=1)).date(), (self.day + timedelta(days=3)).date()
+        self.assertEqual(self.ids(date_from=date_from, date_to=date_to)[0], self.pks(2, 1, 3))
+
+    def test_foreign_and_invalid_filters(self):
+        foreign = Post.objects.get(title="Чужой пост")
+        ids, response = self.ids(post=foreign.pk)
+        self.assertEqual(ids, [])
+        self.assertIsNone(response.context["selected_post"])
+        self.assertEqual(self.ids(post="abc", accepted="2", date_from="вчера")[0], self.pks(2, 1, 0, 4, 3, 5))
+
+    def test_next_link_keeps_filters(self):
+        seen, params = [], {"accepted": "0", "order": "asc"}
+        with mock.patch.object(views, "MY_REPLIES_PER_PAGE", 2):
+            url = "/my-replies/"
+            while url:
+                response = self.client.get(url, params)
+                seen += [reply.pk for reply in response.context["replies"]]
+                url, params = response.context["next_url"], {}
+                if url:
+                    self.assertIn("accepted=0", url)
+                    url = "/my-replies/" + url
+        self.assertEqual(seen, self.pks(4, 3, 2, 1, 0))
+
+    def test_autocomplete(self):
+        results = self.client.get("/my-replies/posts/", {"q": "Ищу"}).json()["results"]
+        self.assertEqual(results, [{"id": self.quiet.pk, "title": "Ищу хила"}, {"id": self.busy.pk, "title": "Ищу танка"}])
+        titles = [post["title"] for post in self.client.get("/my-replies/posts/").json()["results"]]
+        self.assertNotIn("Чужой пост", titles)
+        self.assertEqual(len(titles), 3)
+
+    def test_autocomplete_limit(self):
+        category = self.busy.category
+        for i in range(views.AUTOCOMPLETE_LIMIT):
+            Post.objects.create(author=self.owner, category=category, title=f"Пост {i}", body="текст")
+        results = self.client.get("/my-replies/posts/", {"q": " Пост "}).json()["results"]
+        self.assertEqual(len(results), views.AUTOCOMPLETE_LIMIT)
+
+    def test_login_required(self):
+        self.client.logout()
+        for url in ["/my-replies/", "/my-replies/posts/"]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class MarkNotificationsReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader", email="reader@example.com", password="x")
+        Notification.objects.create(user=cls.user, message="Новый отклик")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_invalid_before(self):
+        for before in ["2026-99-99T00:00", "вчера"]:
+            with self.subTest(before=before):
+                response = self.client.post("/notifications/mark-read/", {"before": before})
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Notification.objects.filter(read=True).exists())
+
+    def test_before(self):
+        self.client.post("/notifications/mark-read/", {"before": "2000-01-01T00:00"})
+        self.assertFalse(Notification.objects.filter(read=True).exists())
+        self.client.post("/notifications/mark-read/", {"before": (timezone.now() + timedelta(minutes=1)).isoformat()})
+        self.assertTrue(Notification.objects.filter(read=True).exists())
+
+
+class PurgeReadNotificationsTests(TestCase):
+    """Чистка удаляет только прочитанные уведомления старше окна хранения"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader")
+        now = timezone.now()
+        cls.kept, cls.purged = [], []
+        for age, read, purged in [(100, True, True), (91, True, True), (89, True, False), (100, False, False), (1, True, False)]:
+            notification = Notification.objects.create(user=cls.user, message="Новый отклик", read=read)
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(days=age))
+            (cls.purged if purged else cls.kept).append(notification.pk)
+
+    def remaining(self):
+        return sorted(Notification.objects.values_list("pk", flat=True))
+
+    def test_retention_window(self):
+        self.assertEqual(notifications.purge_read(days=90), 2)
+        self.assertEqual(self.remaining(), sorted(self.kept))
+        self.assertEqual(notifications.purge_read(days=90), 0)
+
+    def test_batches(self):
+        # две пачки по одной строке — и остановка по max_batches
+        self.assertEqual(notifications.purge_read(days=90, batch_size=1, max_batches=1), 1)
+        self.assertEqual(notifications.purge_read(days=90, batch_size=1), 1)
+        self.assertEqual(self.remaining(), sorted(self.kept))
+
+    def test_shorter_window(self):
+        self.assertEqual(notifications.purge_read(days=30), 3)
+        self.assertEqual(len(self.remaining()), 2)
+
+
+class RankingDecayTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", email="author@example.com", password="x")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=author, category=category, title="Ищу танка", body="текст")
+
+    def test_decay_uses_stored_watermark(self):
+        now = timezone.now()
+        PostRank.objects.filter(pk=self.post.pk).update(hot_score=8.0)
+        self.assertEqual(decay(now), 0)  # первый запуск только ставит отметку
+        self.assertEqual(RankingWatermark.objects.get().decayed_at, now)
+
+        later = now + timedelta(hours=48)
+        self.assertEqual(decay(later), 1)
+        self.assertAlmostEqual(PostRank.objects.get(pk=self.post.pk).hot_score, 2.0)
+        # повторный запуск за тот же интервал ничего не меняет
+        self.assertEqual(decay(later), 0)
+        self.assertAlmostEqual(PostRank.objects.get(pk=self.post.pk).hot_score, 2.0)
+
+    def test_removed_replies_retract_decayed_weight(self):
+        replier = User.objects.create_user("replier")
+        now = timezone.now()
+        replies = [Reply.objects.create(post=self.post, author=replier, text="Я") for _ in range(3)]
+        accept_replies(Reply.objects.filter(pk=replies[0].pk))
+        Reply.objects.filter(pk__in=[r.pk for r in replies]).update(created_at=now - timedelta(hours=48))
+        Reply.objects.filter(pk=replies[0].pk).update(accepted_at=now - timedelta(hours=24))
+        ranking.rebuild()
+
+        # принятый отклик снимается мягко, второй — удалением строки
+        soft_delete_replies(Reply.objects.filter(pk=replies[0].pk))
+        Reply.objects.get(pk=replies[1].pk).delete()
+        incremental = PostRank.objects.values_list("score", "hot_score").get(pk=self.post.pk)
+        ranking.rebuild()
+        expected = PostRank.objects.values_list("score", "hot_score").get(pk=self.post.pk)
+        self.assertAlmostEqual(incremental[0], expected[0])
+        self.assertAlmostEqual(incremental[1], expected[1], places=4)
+
+
+class UnreadCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader", email="reader@example.com", password="x")
+
+    def setUp(self):
+        cache.clear()
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_many([Notification(user=self.user, message="Новый отклик")])
+
+    def test_counter_follows_notifications(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(unread_count(self.user.pk), 0)
+        self.notify()
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.user.pk), 1)
+
+    def test_increment_during_count_is_not_lost(self):
+        # COUNT прошёл до уведомления, а кэш пишется уже после его инкремента
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(unread_count(self.user.pk), 0)
+        self.notify()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+
+class NewsletterDeliveryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", email="admin@example.com", password="x")
+        cls.users = [User.objects.create_user(f"user{i}", email=f"user{i}@example.com") for i in range(3)]
+        cls.newsletter = Newsletter.objects.create(subject="Тема", body="текст")
+
+    def send(self):
+        request = RequestFactory().post(f"/newsletters/{self.newsletter.pk}/send/")
+        request.user = self.admin
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        with mock.patch.object(views.send_newsletter_task, "delay") as delay:
+            views.send_newsletter(request, self.newsletter.pk)
+        return delay
+
+    def test_claimed_rows_are_skipped(self):
+        newsletters.plan_deliveries(self.newsletter)
+        # строку уже забрал другой процесс
+        NewsletterDelivery.objects.filter(user=self.users[0]).update(status=OUTBOX_SENDING)
+        sent, failed, _ = newsletters.deliver(self.newsletter, batch_size=2)
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertNotIn([self.users[0].email], [m.to for m in mail.outbox])
+        self.assertEqual(newsletters.deliver(self.newsletter)[:2], (0, 0))
+
+    def test_claim_retries_after_lost_race(self):
+        newsletters.plan_deliveries(self.newsletter)
+        first = self.newsletter.deliveries.order_by("pk").first()
+        real_update = QuerySet.update
+        updates = []
+
+        def racing_update(queryset, **kwargs):
+            if not updates:
+                # другой процесс забирает строку между SELECT и UPDATE
+                real_update(NewsletterDelivery.objects.filter(pk=first.pk), status=OUTBOX_SENDING)
+            updates.append(real_update(queryset, **kwargs))
+            return updates[-1]
+
+        with mock.patch.object(QuerySet, "update", racing_update):
+            batch = newsletters._claim(self.newsletter, [OUTBOX_PENDING], 0, 10)
+        # неполный захват откатывается и пачка выбирается заново
+        self.assertEqual(updates, [3, 4])
+        self.assertEqual(len(batch), 4)
+        self.assertTrue(all(d.status == OUTBOX_SENDING for d in batch))
+
+    def test_resume_after_crash_between_batches(self):
+        def crash(sent, failed, elapsed):
+            raise RuntimeError("воркер упал")
+
+        with self.assertRaises(RuntimeError):
+            newsletters.deliver(self.newsletter, batch_size=2, progress=crash)
+        self.assertEqual(len(mail.outbox), 2)
+        # повторный запуск досылает только остаток
+        self.assertEqual(newsletters.deliver(self.newsletter, batch_size=2)[:2], (2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(u.email for u in [self.admin, *self.users]))
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.sent)
+
+    def test_resume_after_crash_inside_batch(self):
+        real_send = EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            if len(mail.outbox) == 2:
+                raise SystemExit  # процесс убит посреди второй пачки
+            return real_send(backend, messages)
+
+        with mock.patch.object(EmailBackend, "send_messages", send_messages), self.assertRaises(SystemExit):
+            newsletters.deliver(self.newsletter, batch_size=2)
+        stuck = self.newsletter.deliveries.filter(status=OUTBOX_SENDING)
+        self.assertEqual(stuck.count(), 2)
+        # неподтверждённые строки без явного разрешения не повторяются
+        self.assertEqual(newsletters.deliver(self.newsletter, batch_size=2)[:2], (0, 0))
+        self.newsletter.refresh_from_db()
+        self.assertFalse(self.newsletter.sent)
+        self.assertEqual(newsletters.deliver(self.newsletter, batch_size=2, resend_unconfirmed=True)[:2], (2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(u.email for u in [self.admin, *self.users]))
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.sent)
+
+    def test_view_refuses_sending_or_sent(self):
+        self.send().assert_called_once_with(self.newsletter.pk)
+        newsletters.plan_deliveries(self.newsletter)
+        self.newsletter.deliveries.filter(user=self.users[0]).update(status=OUTBOX_SENDING)
+        self.send().assert_not_called()
+        self.newsletter.deliveries.update(status=OUTBOX_SENT)
+        Newsletter.objects.filter(pk=self.newsletter.pk).update(sent=True)
+        self.send().assert_not_called()
+
+
+class PkRangesTests(TestCase):
+    def test_boundaries(self):
+        users = [User.objects.create_user(f"user{i}") for i in range(5)]
+        pks = [user.pk for user in users]
+        self.assertEqual(list(pk_ranges(User.objects.all(), 2)), [(pks[0], pks[1]), (pks[2], pks[3]), (pks[4], pks[4])])
+        self.assertEqual(list(pk_ranges(User.objects.all(), 5)), [(pks[0], pks[4])])
+        self.assertEqual(list(pk_ranges(User.objects.none(), 2)), [])
+
+
+class OutboxTests(TestCase):
+    schedule_drain_unpatched = staticmethod(outbox.schedule_drain)
+
+    def setUp(self):
+        patcher = mock.patch.object(outbox, "schedule_drain")
+        self.schedule_drain = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def failing_for(self, *addresses):
+        """locmem-бэкенд, который падает на письмах этим адресатам"""
+        real_send = EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            if any(address in message.to for message in messages for address in addresses):
+                raise ConnectionError("SMTP недоступен")
+            return real_send(backend, messages)
+        return mock.patch.object(EmailBackend, "send_messages", send_messages)
+
+    def test_enqueue_sends_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.enqueue("Тема", "текст", ["a@example.com", "a@example.com", "", "b@example.com"])
+        self.assertEqual(OutgoingEmail.objects.filter(status=OUTBOX_PENDING).count(), 2)
+        self.schedule_drain.assert_called_once_with()
+        self.assertEqual(outbox.drain(), (2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["a@example.com", "b@example.com"])
+        self.assertEqual(OutgoingEmail.objects.filter(status=OUTBOX_SENT).count(), 2)
+
+    def test_schedule_drain_does_not_wait_for_broker(self):
+        with mock.patch.object(tasks.drain_outbox, "apply_async", side_effect=OperationalError) as apply_async:
+            with self.assertLogs("board.outbox", "WARNING"):
+                self.schedule_drain_unpatched()
+        apply_async.assert_called_once_with(retry=False, ignore_result=True)
+
+    def test_rollback_drops_emails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                outbox.enqueue("Тема", "текст", ["a@example.com"])
+                raise RuntimeError
+        self.assertFalse(OutgoingEmail.objects.exists())
+        self.schedule_drain.assert_not_called()
+
+    def test_lease(self):
+        now = timezone.now()
+        OutgoingEmail.objects.create(
+            subject="Тема", body="текст", to="leased@example.com",
+            status=OUTBOX_SENDING, next_attempt_at=now + timedelta(minutes=5),
+        )
+        expired = OutgoingEmail.objects.create(
+            subject="Тема", body="текст", to="expired@example.com",
+            status=OUTBOX_SENDING, next_attempt_at=now - timedelta(minutes=1),
+        )
+        # строку другого воркера не трогаем, пока не истёк LEASE; брошенную забираем
+        self.assertEqual([email.pk for email in outbox._claim(10)], [expired.pk])
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, OUTBOX_SENDING)
+        self.assertGreater(expired.next_attempt_at, now + outbox.LEASE - timedelta(minutes=1))
+        # захваченная строка не достаётся следующему разбору
+        self.assertEqual(outbox._claim(10), [])
+
+    def test_failure_backs_off_then_gives_up(self):
+        ok = OutgoingEmail.objects.create(subject="Тема", body="текст", to="ok@example.com")
+        bad = OutgoingEmail.objects.create(subject="Тема", body="текст", to="bad@example.com")
+        with self.failing_for("bad@example.com"):
+            self.assertEqual(outbox.drain(), (1, 1))
+            ok.refresh_from_db()
+            bad.refresh_from_db()
+            self.assertEqual(ok.status, OUTBOX_SENT)
+            self.assertEqual((bad.status, bad.attempts), (OUTBOX_PENDING, 1))
+            self.assertIn("ConnectionError", bad.last_error)
+            self.assertGreater(bad.next_attempt_at, timezone.now() + outbox.backoff(1) - timedelta(seconds=5))
+            # до истечения backoff повтора нет
+            self.assertEqual(outbox.drain(), (0, 0))
+
+            for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+                OutgoingEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+                self.assertEqual(outbox.drain(), (0, 1))
+            bad.refresh_from_db()
+            self.assertEqual((bad.status, bad.attempts), (OUTBOX_FAILED, outbox.MAX_ATTEMPTS))
+            OutgoingEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(outbox.drain(), (0, 0))
+        self.assertEqual([m.to for m in mail.outbox], [["ok@example.com"]])
+
+    def test_backoff_grows_and_is_capped(self):
+        delays = [outbox.backoff(attempt) for attempt in range(1, 10)]
+        self.assertEqual(delays, sorted(delays))
+        self.assertEqual(delays[-1], timedelta(hours=1))
+
+    def test_send_now_failure_is_retried_by_drain(self):
+        with self.failing_for("bad@example.com"):
+            self.assertEqual(outbox.send_now("Тема", "текст", ["ok@example.com", "bad@example.com"]), (1, 1))
+        OutgoingEmail.objects.filter(status=OUTBOX_PENDING).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["bad@example.com", "ok@example.com"])
+
+
+@mock.patch.object(db, "has_replica", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    """Куда маршрутизируются чтения в зависимости от метода запроса и sticky-cookie"""
+
+    def request(self, method="get", cookies=None, write=False):
+        router = db.ReplicaRouter()
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(Post))
+            if write:
+                router.db_for_write(Post)
+                reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        response = db.ReplicaMiddleware(view)(request)
+        return reads, response
+
+    def test_get_reads_replica(self, has_replica):
+        reads, response = self.request()
+        self.assertEqual(reads, [db.REPLICA])
+        self.assertNotIn(db.STICKY_COOKIE, response.cookies)
+
+    def test_write_switches_to_primary_and_sets_cookie(self, has_replica):
+        reads, response = self.request("post", write=True)
+        self.assertEqual(reads, ["default", "default"])
+        self.assertEqual(response.cookies[db.STICKY_COOKIE]["max-age"], db.STICKY_SECONDS)
+
+    def test_get_after_write_reads_primary(self, has_replica):
+        _, response = self.request("post", write=True)
+        reads, _ = self.request(cookies={db.STICKY_COOKIE: response.cookies[db.STICKY_COOKIE].value})
+        self.assertEqual(reads, ["default"])
+
+    def test_use_primary(self, has_replica):
+        router = db.ReplicaRouter()
+        reads = []
+
+        def view(request):
+            with db.use_primary():
+                reads.append(router.db_for_read(Post))
+            reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        db.ReplicaMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(reads, ["default", db.REPLICA])
+
+    def test_outside_request_reads_primary(self, has_replica):
+        self.assertEqual(db.ReplicaRouter().db_for_read(Post), "default")
+
+
+class NotificationStreamTests(TestCase):
+    """SSE-поток под ASGI: уведомление из синхронного кода доходит событием"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user")
+
+    def setUp(self):
+        # внутрипроцессный брокер: событие доходит без Redis
+        patcher = mock.patch.object(push, "_broker", push.LocalBroker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, message="Новый отклик", url="/posts/1/")
+
+    async def test_notification_is_streamed(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/notifications/stream/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(events), b"retry: 5000\n\n")
+            notification = await sync_to_async(self.notify)()
+            event = await asyncio.wait_for(anext(events), timeout=5)
+        finally:
+            await events.aclose()
+        name, data = event.decode().strip().split("\n")
+        self.assertEqual(name, "event: notification")
+        self.assertEqual(json.loads(data.removeprefix("data: ")), notification_event(notification))
+
+    async def test_anonymous_is_forbidden(self):
+        response = await self.async_client.get("/notifications/stream/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_replica_middleware_stays_async(self):
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(db.ReplicaMiddleware(view)))
+        self.assertFalse(iscoroutinefunction(db.ReplicaMiddleware(lambda request: HttpResponse())))
+
+
+@skipUnless(db.has_replica(), "реплика не настроена (DB_REPLICA_HOST / DB_REPLICA_NAME)")
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Запросы действительно уходят на соединение реплики. В TestCase всё идёт
+    внутри транзакции и читается с primary, поэтому здесь TransactionTestCase.
+    """
+    databases = {"default", db.REPLICA} if db.has_replica() else {"default"}
+
+    def setUp(self):
+        cache.clear()
+        # вне транзакции on_commit срабатывает сразу — задачи Celery в брокер не отправляем
+        patcher = mock.patch("celery.app.task.Task.apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user("author", email="author@example.com", password="x")
+        category = Category.objects.create(code="Tank", title="Танк")
+        self.post = Post.objects.create(author=self.author, category=category, title="Ищу танка", body="текст")
+
+    def queries(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections[db.REPLICA]) as replica:
+                response = method(*args, **kwargs)
+        return response, primary.captured_queries, replica.captured_queries
+
+    def test_sticky_cookie(self):
+        self.client.force_login(self.author)
+        _, primary, replica = self.queries(self.client.get, "/my-posts/")
+        self.assertTrue(replica)
+
+        response, _, _ = self.queries(self.client.post, f"/posts/{self.post.pk}/", {"text": "Я танк"})
+        self.assertIn(db.STICKY_COOKIE, response.cookies)
+        _, primary, replica = self.queries(self.client.get, "/my-posts/")
+        self.assertFalse(replica)
+        self.assertTrue(primary)
+
+    def test_anonymous_pages_are_cached_from_primary(self):
+        for url in ["/", f"/posts/{self.post.pk}/", "/ranking/"]:
+            with self.subTest(url=url):
+                _, primary, replica = self.queries(self.client.get, url)
+                self.assertFalse(replica)
+                self.assertTrue(primary)
+
+    def test_validators_are_read_from_primary(self):
+        # сам ответ API не кэшируется и читается с реплики, а его ETag — с primary
+        _, primary, replica = self.queries(self.client.get, f"/api/posts/{self.post.pk}/")
+        self.assertTrue(replica)
+        self.assertTrue(any("MAX(" in query["sql"] for query in primary))
+        self.assertFalse(any("MAX(" in query["sql"] for query in replica))
+
+    def test_unread_count_is_read_from_primary(self):
+        Notification.objects.create(user=self.author, message="Новый отклик", url="/")
+        self.client.force_login(self.author)
+        _, primary, replica = self.queries(self.client.get, "/my-posts/")
+        self.assertTrue(replica)
+        counts = [query["sql"] for query in primary if "COUNT(" in query["sql"] and "board_notification" in query["sql"]]
+        self.assertTrue(counts)
+        self.assertFalse([query for query in replica if "board_notification" in query["sql"]])
+        self.assertEqual(cache.get(f"notifications:unread:{self.author.pk}"), 1)
+
+    def test_reply_fragment_is_cached_from_primary(self):
+        replier = User.objects.create_user("replier", password="x")
+        Reply.objects.create(post=self.post, author=replier, text="Я танк")
+        self.client.force_login(replier)
+        response, _, replica = self.queries(self.client.get, f"/posts/{self.post.pk}/")
+        self.assertContains(response, "Я танк")
+        self.assertFalse([query for query in replica if 'FROM "board_reply"' in query["sql"]])
+
+
+class PostValidatorsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_keys_are_memcached_safe(self):
+        author = User.objects.create_user("author")
+        post = Post.objects.create(
+            author=author, category=Category.objects.create(code="Tank", title="Танк"), title="Ищу танка", body="текст",
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", CacheKeyWarning)
+            published = post_validators(post.pk, published=True)
+            self.assertEqual(post_validators(post.pk), published)
+            self.assertIsNone(post_validators(post.pk, published=False))
+
+
+class PostSummaryTests(TestCase):
+    """Проекция PostSummary следует за постом, категорией и именем автора"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=cls.category, title="Ищу танка", body="<p>текст</p>")
+
+    def summary(self):
+        return PostSummary.objects.get(pk=self.post.pk)
+
+    def test_created_with_post(self):
+        summary = self.summary()
+        self.assertEqual(
+            (summary.title, summary.excerpt, summary.author_username, summary.category_title, summary.published),
+            ("Ищу танка", "текст", "author", "Танк", True),
+        )
+
+    def test_post_edit(self):
+        other = Category.objects.create(code="Healer", title="Хил")
+        self.post.title, self.post.body, self.post.category, self.post.published = "Ищу хила", "<b>срочно</b>", other, False
+        self.post.save()
+        summary = self.summary()
+        self.assertEqual(
+            (summary.title, summary.excerpt, summary.category_id, summary.category_title, summary.published),
+            ("Ищу хила", "срочно", other.pk, "Хил", False),
+        )
+
+    def test_category_rename(self):
+        self.category.title = "Танки"
+        self.category.save()
+        self.assertEqual(self.summary().category_title, "Танки")
+
+    def test_author_rename(self):
+        self.author.username = "tank_lead"
+        self.author.save()
+        self.assertEqual(self.summary().author_username, "tank_lead")
+
+    def test_login_does_not_touch_summaries(self):
+        with self.assertNumQueries(1):
+            self.author.save(update_fields=["last_login"])
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= в API: лишние поля не сериализуются и не читаются из БД"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author")
+        category = Category.objects.create(code="Tank", title="Танк")
+        for i in range(3):
+            Post.objects.create(author=author, category=category, title=f"Ищу танка {i}", body="<p>текст</p>")
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, queries, **params):
+        with self.assertNumQueries(queries) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"], context.captured_queries
+
+    def test_only_requested_fields(self):
+        results, queries = self.get("/api/posts/", 1, fields="id,title")
+        self.assertEqual([set(post) for post in results], [{"id", "title"}] * 3)
+        # категория не JOIN'ится, текст поста не читается
+        self.assertNotIn("board_category", queries[0]["sql"])
+        self.assertNotIn("excerpt", queries[0]["sql"])
+
+    def test_unknown_fields_are_ignored(self):
+        results, _ = self.get("/api/posts/", 1, fields="id,bogus")
+        self.assertEqual([set(post) for post in results], [{"id"}] * 3)
+        full, _ = self.get("/api/posts/", 1)
+        results, _ = self.get("/api/posts/", 1, fields="bogus")
+        self.assertEqual(results, full)
+
+    def test_nested_category_in_one_query(self):
+        results, queries = self.get("/api/posts/", 1, fields="id,category")
+        self.assertEqual(results[0]["category"]["title"], "Танк")
+        self.assertIn("board_category", queries[0]["sql"])
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "поисковый индекс есть только для SQLite и PostgreSQL")
+class SearchTests(TestCase):
+    """Полнотекстовый поиск: ранжирование, сниппет и обновление индекса"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.in_body = Post.objects.create(
+            author=cls.author, category=category, title="Рейд в субботу", body="<p>Нужен танк и два хила</p>",
+        )
+        cls.in_title = Post.objects.create(author=cls.author, category=category, title="Ищу танка", body="<p>Ключ +10</p>")
+        Post.objects.create(author=cls.author, category=category, title="Ищу хила", body="<p>Без танков не звать</p>", published=False)
+
+    def test_title_hit_ranks_first(self):
+        self.assertEqual(search_post_ids("танк"), [self.in_title.pk, self.in_body.pk])
+
+    def test_html_results_with_snippet(self):
+        response = self.client.get("/search/", {"q": "танк"})
+        self.assertEqual([post.pk for post in response.context["posts"]], [self.in_title.pk, self.in_body.pk])
+        self.assertContains(response, "Нужен танк и два хила")
+        self.assertNotContains(response, "Без танков")
+
+    def test_api_results_with_snippet(self):
+        response = self.client.get("/api/posts/search/", {"q": "танк"})
+        results = response.json()["results"]
+        self.assertEqual([post["id"] for post in results], [self.in_title.pk, self.in_body.pk])
+        self.assertEqual(results[1]["excerpt"], "Нужен танк и два хила")
+
+    def test_empty_query(self):
+        self.assertEqual(self.client.get("/api/posts/search/", {"q": " "}).json()["results"], [])
+        self.assertEqual(list(self.client.get("/search/").context["posts"]), [])
+
+    def test_index_follows_edit_unpublish_and_delete(self):
+        self.in_title.title = "Ищу целителя"
+        self.in_title.save()
+        self.assertEqual(search_post_ids("целител"), [self.in_title.pk])
+        self.assertEqual(search_post_ids("танк"), [self.in_body.pk])
+
+        self.in_body.published = False
+        self.in_body.save()
+        self.assertEqual(search_post_ids("танк"), [])
+
+        self.in_title.delete()
+        self.assertEqual(search_post_ids("целител"), [])
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/If-None-Match на деталях поста в API и на списке постов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=category, title="Ищу танка", body="текст")
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("celery.app.task.Task.apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = f"/api/posts/{self.post.pk}/"
+
+    def test_repeat_get_is_not_modified(self):
+        for url in [self.url, "/api/posts/"]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertFalse(response.content)
+
+    def assertChangesETag(self, change):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        return response
+
+    def test_new_reply_changes_etag(self):
+        self.assertChangesETag(lambda: Reply.objects.create(post=self.post, author=self.replier, text="Я танк"))
+
+    def test_post_edit_changes_etag(self):
+        def edit():
+            self.post.title = "Ищу хила"
+            self.post.save()
+        self.assertEqual(self.assertChangesETag(edit).json()["title"], "Ищу хила")
+
+    def test_variants_get_own_etags(self):
+        # в ETag входят активный язык и Accept: JSON и browsable API — разные ответы
+        json_etag = self.client.get(self.url, HTTP_ACCEPT="application/json")["ETag"]
+        html_etag = self.client.get(self.url, HTTP_ACCEPT="text/html")["ETag"]
+        with translation.override("en"):
+            en_etag = self.client.get(self.url, HTTP_ACCEPT="application/json", HTTP_ACCEPT_LANGUAGE="en")["ETag"]
+        self.assertEqual(len({json_etag, html_etag, en_etag}), 3)
+        response = self.client.get(self.url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class PostPageInvalidationTests(TestCase):
+    """Изменения поста меняют и закэшированную анонимную страницу, и ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=category, title="Ищу танка", body="текст")
+        cls.reply = Reply.objects.create(post=cls.post, author=cls.replier, text="Я танк")
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("celery.app.task.Task.apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = f"/posts/{self.post.pk}/"
+
+    def assertInvalidates(self, change, expected):
+        before = self.client.get(self.url)
+        self.assertNotContains(before, expected)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        after = self.client.get(self.url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertContains(after, expected)
+
+    def test_post_edit(self):
+        def edit():
+            self.post.title = "Ищу хила"
+            self.post.save()
+        self.assertInvalidates(edit, "Ищу хила")
+
+    def test_reply_added(self):
+        self.assertInvalidates(lambda: Reply.objects.create(post=self.post, author=self.replier, text="И я"), "И я")
+
+    def test_reply_accepted(self):
+        self.assertInvalidates(lambda: accept_replies(Reply.objects.filter(pk=self.reply.pk)), "bg-success")
+
+    def test_reply_author_renamed(self):
+        def rename():
+            self.replier.username = "healer"
+            self.replier.save()
+        self.assertInvalidates(rename, "healer")
+
+
+class ReputationRetractTests(TestCase):
+    """Удаление откликов снимает начисленную репутацию так же, как полный пересчёт"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        category = Category.objects.create(code="Tank", title="Танк")
+        cls.post = Post.objects.create(author=cls.author, category=category, title="Ищу танка", body="текст")
+        cls.other_post = Post.objects.create(author=cls.author, category=category, title="Ищу хила", body="текст")
+
+    def setUp(self):
+        self.replies = [
+            Reply.objects.create(post=post, author=self.replier, text="Я")
+            for post in (self.post, self.post, self.other_post)
+        ]
+        accept_replies(Reply.objects.filter(pk=self.replies[0].pk))
+        past = timezone.now() - timedelta(days=3)
+        Reply.objects.update(created_at=past, accepted_at=past)
+        reputation.recompute()
+        self.before = self.scores()
+
+    def scores(self):
+        return dict(Author.objects.values_list("user_id", "reputation_score"))
+
+    def assertMatchesRecompute(self):
+        scores = self.scores()
+        self.assertLess(scores[self.replier.pk], self.before[self.replier.pk])
+        reputation.recompute(now=ReputationWatermark.objects.get().computed_at + timedelta(seconds=60))
+        for user_id, score in self.scores().items():
+            self.assertAlmostEqual(scores[user_id], score, delta=0.01)
+
+    def test_soft_delete(self):
+        soft_delete_replies(Reply.objects.filter(pk=self.replies[0].pk))
+        self.assertMatchesRecompute()
+
+    def test_hard_delete(self):
+        Reply.objects.get(pk=self.replies[1].pk).delete()
+        self.assertMatchesRecompute()
+
+    def test_post_delete(self):
+        Post.objects.get(pk=self.post.pk).delete()
+        scores = self.scores()
+        self.assertMatchesRecompute()
+        self.assertGreater(scores[self.replier.pk], 0)
+
+    def test_new_replies_are_not_retracted(self):
+        reply = Reply.objects.create(post=self.post, author=self.replier, text="Ещё")
+        soft_delete_replies(Reply.objects.filter(pk=reply.pk))
+        self.assertEqual(self.scores(), self.before)
+
+
+class AuthorStatsTests(TestCase):
+    """Инкрементальные обновления AuthorStats сходятся с полным пересчётом"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.replier = User.objects.create_user("replier")
+        cls.tank = Category.objects.create(code="Tank", title="Танк")
+        cls.healer = Category.objects.create(code="Healer", title="Хил")
+        cls.posts = [
+            Post.objects.create(author=cls.author, category=category, title=f"Пост {i}", body="текст")
+            for i, category in enumerate([cls.tank, cls.tank, cls.healer])
+        ]
+        cls.replies = [Reply.objects.create(post=post, author=cls.replier, text="Я") for post in cls.posts]
+
+    def assertMatchesRebuild(self):
+        incremental = list(AuthorStats.objects.order_by("pk").values("pk", *stats.STATS_FIELDS))
+        stats.rebuild()
+        self.assertEqual(incremental, list(AuthorStats.objects.order_by("pk").values("pk", *stats.STATS_FIELDS)))
+        return {row["pk"]: row for row in incremental}
+
+    def test_accept(self):
+        accept_replies(Reply.objects.filter(pk__in=[self.replies[0].pk, self.replies[2].pk]))
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(rows[self.author.pk]["accepted_replies"], 2)
+        self.assertEqual(rows[self.replier.pk]["reply_count"], 3)
+
+    def test_delete(self):
+        accept_replies(Reply.objects.filter(pk=self.replies[0].pk))
+        self.replies[0].delete()
+        self.posts[2].delete()
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(rows[self.author.pk]["post_count"], 2)
+        self.assertEqual(rows[self.author.pk]["accepted_replies"], 0)
+        self.assertEqual(rows[self.author.pk]["last_post"], self.posts[1].pk)
+        self.assertEqual(rows[self.replier.pk]["reply_count"], 1)
+
+    def test_category_rename(self):
+        self.tank.title = "Танки"
+        self.tank.save()
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(
+            rows[self.author.pk]["top_categories"], [{"title": "Танки", "count": 2}, {"title": "Хил", "count": 1}],
+        )
+
+    def test_post_edit(self):
+        self.posts[2].title, self.posts[2].category = "Ищу танка", self.tank
+        self.posts[2].save()
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(rows[self.author.pk]["last_post_title"], "Ищу танка")
+
+
+class ReplyBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        replier = User.objects.create_user("replier")
+        post = Post.objects.create(
+            author=cls.author, category=Category.objects.create(code="Tank", title="Танк"), title="Ищу танка", body="текст",
+        )
+        cls.replies = [Reply.objects.create(post=post, author=replier, text="Я") for _ in range(2)]
+
+    def test_overlapping_ids_are_rejected(self):
+        self.client.force_login(self.author)
+        first, second = (reply.pk for reply in self.replies)
+        response = self.client.post(
+            "/api/replies/bulk/", {"accept": [first, second], "delete": [second]}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reply.objects.filter(accepted=True).exists())
+        self.assertFalse(Reply.objects.filter(deleted=True).exists())
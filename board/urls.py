@@ -13,14 +13,18 @@ urlpatterns = [
 
     path("my-posts/", views.my_posts_view, name="my_posts"),
     path('my-replies/', my_replies_view, name='my_replies'),
+    path("my-replies/posts/", views.my_posts_autocomplete, name="my_posts_autocomplete"),
     path('reply/<int:reply_id>/delete/', delete_reply, name='reply_delete'),
     path("replies/<int:pk>/accept/", views.accept_reply, name="reply_accept"),
 
+    path("search/", views.search_view, name="post_search"),
+
     path("posts/", PostListView.as_view(), name="post_list"),
     path("posts/<int:pk>/", PostDetailView.as_view(), name="post_detail"),
     path("posts/create/", PostCreateView.as_view(), name="post_create"),
     path("posts/<int:pk>/edit/", PostUpdateView.as_view(), name="post_update"),
     path("posts/<int:pk>/delete/", PostDeleteView.as_view(), name="post_delete"),
+    path("posts/<int:pk>/replies/", views.post_replies_view, name="post_replies"),
 
 
 
@@ -28,6 +32,8 @@ urlpatterns = [
 
     path("notifications/", views.notifications_view, name="notifications"),
     path("notifications/<int:pk>/read/", views.mark_notification_read, name="notification_read"),
+    path("notifications/mark-read/", views.mark_notifications_read, name="notifications_mark_read"),
+    path("notifications/stream/", views.notifications_stream, name="notifications_stream"),
 
 
 
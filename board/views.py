@@ -1,50 +1,75 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.contrib.auth.models import User
-from django.core.mail import send_mass_mail
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import Count
-from django.http import HttpResponseForbidden, JsonResponse
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy, reverse
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, UpdateView, DeleteView, ListView, DetailView
 from django.views.generic.edit import FormMixin
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
-from config import settings
-from .forms import PostForm, ReplyForm
-from .models import Post, Reply, Category, Subscription, Notification, Newsletter
+from appointment.tasks import send_newsletter_task
+from .cache import cache_anonymous, conditional, generation, post_generation, post_validators
+from .choices import OUTBOX_SENDING
+from .db import use_primary
+from .forms import NotificationMarkReadForm, PostForm, ReplyFilterForm, ReplyForm
+from .models import Post, PostRank, PostSummary, Reply, Category, Subscription, Notification, Newsletter
+from .notifications import INBOX_ORDERING, bulk_selection, mark_read, unread_count
+from .pagination import KeysetPagination, keyset_paginate
+from .push import get_broker
+from .search import search_post_ids
+from .services import accept_replies, soft_delete_replies
 from .serializers import (
     PostListSerializer, PostDetailSerializer, PostCreateSerializer,
-    ReplySerializer, CategorySerializer, SubscriptionSerializer
+    ReplySerializer, CategorySerializer, SubscriptionSerializer, PostRankSerializer,
+    NotificationSerializer, NotificationMarkReadSerializer, ReplyBulkSerializer, SubscriptionBulkSerializer,
+    optimize_queryset,
 )
 
 
+@cache_anonymous("posts", "categories")
 def index(request):
-    posts_qs = Post.objects.filter(published=True).order_by('-created_at')
-    paginator = Paginator(posts_qs, 10)
-
-    page_number = request.GET.get('page', 1)
-    try:
-        page_obj = paginator.get_page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        page_obj = paginator.get_page(1)
+    posts_qs = PostSummary.objects.filter(published=True)
+    page_obj = keyset_paginate(posts_qs, request.GET.get('cursor'), per_page=10)
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         html = render_to_string('board/post_list_ajax.html', {'posts': page_obj}, request=request)
         return JsonResponse({
             'html': html,
             'has_next': page_obj.has_next(),
-            'page': page_obj.number,
-            'next_page': page_obj.next_page_number() if page_obj.has_next() else None,
+            'next': page_obj.next_cursor,
+            'next_page': page_obj.next_cursor,
         })
 
     return render(request, 'index.html', {'posts': page_obj})
 
 
+def _ordered_summaries(post_ids):
+    summaries = PostSummary.objects.select_related("category").in_bulk(post_ids)
+    return [summaries[pk] for pk in post_ids if pk in summaries]
+
+
+def search_view(request):
+    query = request.GET.get("q", "").strip()
+    paginator = Paginator(search_post_ids(query) if query else [], 10)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    posts = _ordered_summaries(page_obj.object_list)
+    return render(request, "board/search.html", {"query": query, "page_obj": page_obj, "posts": posts})
+
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     form_class = PostForm
@@ -96,22 +121,74 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 
 class PostListView(ListView):
-    model = Post
+    model = PostSummary
     template_name = "board/post_list.html"
     context_object_name = "posts"
-    queryset = Post.objects.filter(published=True)
+    queryset = PostSummary.objects.filter(published=True)
     paginate_by = 5
 
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_paginate(queryset, self.request.GET.get("cursor"), per_page=page_size)
+        return None, page, page.object_list, page.has_next()
+
     def render_to_response(self, context, **response_kwargs):
         if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
             html = render_to_string('board/post_list_ajax.html', context, request=self.request)
-            return JsonResponse({'html': html})
+            page = context["page_obj"]
+            return JsonResponse({
+                'html': html,
+                'has_next': page.has_next(),
+                'next': page.next_cursor,
+                'next_page': page.next_cursor,
+            })
         else:
             return super().render_to_response(context, **response_kwargs)
 
 
+REPLIES_PER_PAGE = 20
+# отклики идут в порядке написания, ключ курсора — (created_at, pk)
+REPLY_ORDERING = ("created_at", "pk")
+
+
+def _reply_page(post, cursor=None):
+    replies = post.replies.filter(deleted=False).select_related("author")
+    return keyset_paginate(replies, cursor, per_page=REPLIES_PER_PAGE, ordering=REPLY_ORDERING)
+
+
+def _cached_reply_page(post):
+    """Первая порция для фрагмента в общем кэше — с primary, как и cache_anonymous"""
+    with use_primary():
+        return _reply_page(post)
+
+
+def post_replies_view(request, pk):
+    """Следующая порция откликов поста для кнопки «Показать ещё»"""
+    post = get_object_or_404(Post.objects.only("pk", "author_id"), pk=pk)
+    replies = _reply_page(post, request.GET.get("cursor"))
+    html = render_to_string("board/_reply_page.html", {"post": post, "replies": replies}, request=request)
+    next_url = None
+    if replies.has_next():
+        next_url = f"{reverse('post_replies', kwargs={'pk': pk})}?cursor={replies.next_cursor}"
+    return JsonResponse({"html": html, "has_next": replies.has_next(), "next": next_url})
+
+
+def _post_page_validators(request, pk):
+    found = post_validators(pk)
+    if found is None:
+        return None
+    version, last_modified = found
+    version += f":{generation('categories')}"
+    if request.user.is_authenticated:
+        # на странице кнопки владельца и счётчик уведомлений в шапке
+        version += f":{request.user.pk}:{unread_count(request.user.pk)}"
+    return version, last_modified
+
+
+@method_decorator(conditional(_post_page_validators), name="dispatch")
+@method_decorator(cache_anonymous("categories", lambda pk: post_generation(pk)), name="dispatch")
 class PostDetailView(FormMixin, DetailView):
     model = Post
+    queryset = Post.objects.select_related("author", "category")
     template_name = "board/post_detail.html"
     context_object_name = "post"
     form_class = ReplyForm
@@ -119,6 +196,14 @@ class PostDetailView(FormMixin, DetailView):
     def get_success_url(self):
         return reverse("post_detail", kwargs={"pk": self.object.pk})
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # ключ фрагмента со списком откликов (board/_reply_list.html)
+        context["reply_version"] = generation(post_generation(self.object.pk))
+        # первая порция грузится, только если фрагмента нет в кэше
+        context["replies"] = SimpleLazyObject(lambda: _cached_reply_page(self.object))
+        return context
+
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         form = self.get_form()
@@ -126,22 +211,24 @@ class PostDetailView(FormMixin, DetailView):
             if self.object.author == request.user:
                 return HttpResponseForbidden("Вы не можете откликаться на свой пост.")
 
-            reply = form.save(commit=False)
-            reply.author = request.user
-            reply.post = self.object
-            reply.save()
-
-            Notification.objects.create(
-                user=self.object.author,
-                message=f"{request.user.username} оставил отклик на ваш пост '{self.object.title}'",
-                url=reverse("post_detail", kwargs={"pk": self.object.pk})
-            )
+            # отклик, уведомление и письмо в outbox коммитятся вместе
+            with transaction.atomic():
+                reply = form.save(commit=False)
+                reply.author = request.user
+                reply.post = self.object
+                reply.save()
+
+                Notification.objects.create(
+                    user=self.object.author,
+                    message=f"{request.user.username} оставил отклик на ваш пост '{self.object.title}'",
+                    url=reverse("post_detail", kwargs={"pk": self.object.pk})
+                )
 
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                replies_html = render_to_string(
-                    "board/_reply_list.html", {"post": self.object}, request=request
+                reply_html = render_to_string(
+                    "board/_reply.html", {"post": self.object, "reply": reply}, request=request
                 )
-                return JsonResponse({"html": replies_html})
+                return JsonResponse({"html": reply_html})
 
             return redirect(self.get_success_url())
         return self.form_invalid(form)
@@ -153,8 +240,7 @@ def accept_reply(request, pk):
     if reply.post.author != request.user:
         return HttpResponseForbidden("Вы не можете принимать этот отклик.")
 
-    reply.accepted = True
-    reply.save()
+    accept_replies(Reply.objects.filter(pk=reply.pk))
 
     Notification.objects.create(
         user=reply.author,
@@ -171,9 +257,40 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class SerializerQuerysetMixin:
+    """На чтение подгоняет select_related/only под поля сериализатора (с учётом ?fields=)"""
+
+    def optimize(self, queryset):
+        # ключ курсора читается с последней строки страницы — его колонки тоже нужны
+        ordering = getattr(self, "keyset_ordering", None) or KeysetPagination.ordering
+        keyset = [field.lstrip("-") for field in ordering if field.lstrip("-") != "pk"]
+        return optimize_queryset(queryset, self.get_serializer(), keyset)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = self.optimize(queryset)
+        return queryset
+
+
+class PostViewSet(SerializerQuerysetMixin, viewsets.ModelViewSet):
     queryset = Post.objects.filter(published=True)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        if self.action == "list":
+            # список читается из проекции: body не загружается
+            return self.optimize(PostSummary.objects.filter(published=True))
+        return super().get_queryset()
+
+    @method_decorator(conditional(lambda request: (generation("posts", "categories"), None)))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(conditional(lambda request, pk: post_validators(pk, published=True)))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action in ("list",):
@@ -185,6 +302,15 @@ class PostViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        paginator = PageNumberPagination()
+        paginator.page_size = 20
+        post_ids = paginator.paginate_queryset(search_post_ids(query) if query else [], request, view=self)
+        serializer = PostListSerializer(_ordered_summaries(post_ids), many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def reply(self, request, pk=None):
         post = self.get_object()
@@ -195,10 +321,11 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ReplyViewSet(viewsets.ModelViewSet):
+class ReplyViewSet(SerializerQuerysetMixin, viewsets.ModelViewSet):
     queryset = Reply.objects.filter(deleted=False)
     serializer_class = ReplySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -209,10 +336,82 @@ class ReplyViewSet(viewsets.ModelViewSet):
         post = reply.post
         if post.author != request.user:
             return Response({"detail": "Not allowed"}, status=403)
-        reply.accepted = True
-        reply.save()
+        accept_replies(Reply.objects.filter(pk=reply.pk))
         return Response({"status": "accepted"})
 
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def bulk(self, request):
+        """
+        Принимает и/или снимает отклики на посты пользователя одной транзакцией.
+        Статус на каждый id: accepted/deleted, unchanged, forbidden, not_found.
+        """
+        serializer = ReplyBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accept_ids, delete_ids = serializer.validated_data["accept"], serializer.validated_data["delete"]
+
+        with transaction.atomic():
+            post_authors = dict(
+                Reply.objects.filter(pk__in={*accept_ids, *delete_ids}).values_list("pk", "post__author_id")
+            )
+            own = {pk for pk, author_id in post_authors.items() if author_id == request.user.pk}
+            accepted = {r.pk for r in accept_replies(Reply.objects.filter(pk__in=own & set(accept_ids)))}
+            deleted = {r.pk for r in soft_delete_replies(Reply.objects.filter(pk__in=own & set(delete_ids)))}
+
+        def results(ids, done, status_done):
+            return [
+                {"id": pk, "status": (
+                    "not_found" if pk not in post_authors
+                    else "forbidden" if pk not in own
+                    else status_done if pk in done
+                    else "unchanged"
+                )}
+                for pk in dict.fromkeys(ids)
+            ]
+
+        return Response({
+            "accept": results(accept_ids, accepted, "accepted"),
+            "delete": results(delete_ids, deleted, "deleted"),
+        })
+
+
+class RankingViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = PostRankSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.AllowAny]
+
+    @property
+    def keyset_ordering(self):
+        sort = self.request.query_params.get("sort")
+        return (PostRankingView.SORTS.get(sort, "-hot_score"), "-pk")
+
+    def get_queryset(self):
+        posts = PostRank.objects.filter(published=True)
+        category = self.request.query_params.get("category")
+        if category and category.isdigit():
+            posts = posts.filter(category_id=category)
+        return posts
+
+
+class NotificationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = NotificationSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = INBOX_ORDERING
+
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        notifications = bulk_selection(
+            request.user, mark_all=data["all"], ids=data.get("ids"), before=data.get("before")
+        )
+        updated = mark_read(request.user, notifications)
+        return Response({"updated": updated, "unread": unread_count(request.user.pk, fresh=True)})
+
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
     queryset = Subscription.objects.all()
@@ -225,46 +424,140 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Подписка/отписка на набор категорий одной транзакцией.
+        Статус на каждый id: created/deleted, exists, not_subscribed, not_found.
+        """
+        serializer = SubscriptionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subscribe = list(dict.fromkeys(serializer.validated_data["subscribe"]))
+        unsubscribe = list(dict.fromkeys(serializer.validated_data["unsubscribe"]))
+
+        with transaction.atomic():
+            known = set(Category.objects.filter(pk__in=subscribe + unsubscribe).values_list("pk", flat=True))
+            current = set(
+                self.get_queryset().filter(category_id__in=known).values_list("category_id", flat=True)
+            )
+            Subscription.objects.bulk_create(
+                [Subscription(user=request.user, category_id=pk) for pk in subscribe if pk in known - current],
+                ignore_conflicts=True,
+            )
+            self.get_queryset().filter(category_id__in=current & set(unsubscribe)).delete()
+
+        def status_of(pk, if_current, otherwise):
+            if pk not in known:
+                return "not_found"
+            return if_current if pk in current else otherwise
+
+        return Response({
+            "subscribe": [{"category": pk, "status": status_of(pk, "exists", "created")} for pk in subscribe],
+            "unsubscribe": [
+                {"category": pk, "status": status_of(pk, "deleted", "not_subscribed")} for pk in unsubscribe
+            ],
+        })
+
+
+MY_REPLIES_PER_PAGE = 25
+# сортировка по хранимому счётчику откликов поста; (created_at, pk) делают ключ уникальным
+MY_REPLIES_ORDERING = {
+    "desc": ("-post__live_reply_count", "-created_at", "-pk"),
+    "asc": ("post__live_reply_count", "-created_at", "-pk"),
+}
+# тело поста и профиль автора отклика в таблице не нужны
+MY_REPLIES_FIELDS = (
+    "post_id", "author_id", "text", "created_at", "accepted",
+    "post__title", "post__live_reply_count", "author__username",
+)
+AUTOCOMPLETE_LIMIT = 10
+
 
 @login_required
 def my_replies_view(request):
-    posts = Post.objects.filter(author=request.user)
+    form = ReplyFilterForm(request.GET)
+    replies = form.filter(
+        Reply.objects.filter(post__author=request.user, deleted=False)
+        .select_related("post", "author")
+        .only(*MY_REPLIES_FIELDS)
+    )
+    order = form.cleaned_data.get("order") or "desc"
+    replies = keyset_paginate(
+        replies, request.GET.get("cursor"), per_page=MY_REPLIES_PER_PAGE, ordering=MY_REPLIES_ORDERING[order]
+    )
 
-    post_id = request.GET.get("post")
-    if post_id:
-        replies = Reply.objects.filter(post_id=post_id, post__author=request.user, deleted=False)
-    else:
-        replies = Reply.objects.filter(post__author=request.user, deleted=False)
+    selected_post = None
+    if form.cleaned_data.get("post"):
+        selected_post = Post.objects.filter(
+            pk=form.cleaned_data["post"], author=request.user
+        ).only("pk", "title").first()
 
-    # Сортировка по количеству откликов на пост
-    order = request.GET.get("order", "desc")
-    replies = replies.annotate(num_post_replies=Count("post__replies"))
+    next_url = None
+    if replies.has_next():
+        query = request.GET.copy()
+        query["cursor"] = replies.next_cursor
+        next_url = f"?{query.urlencode()}"
 
-    if order == "asc":
-        replies = replies.order_by("num_post_replies", "-created_at")
-    else:
-        replies = replies.order_by("-num_post_replies", "-created_at")
+    return render(request, "board/my_replies.html", {
+        "form": form,
+        "order": order,
+        "replies": replies,
+        "selected_post": selected_post,
+        "next_url": next_url,
+    })
 
-    return render(request, "board/my_replies.html", {"posts": posts, "replies": replies})
+
+@login_required
+def my_posts_autocomplete(request):
+    """Подсказки для фильтра по посту: id и заголовки, без загрузки всех постов"""
+    posts = Post.objects.filter(author=request.user)
+    query = request.GET.get("q", "").strip()
+    if query:
+        posts = posts.filter(title__icontains=query)
+    results = posts.order_by("-created_at").values("id", "title")[:AUTOCOMPLETE_LIMIT]
+    return JsonResponse({"results": list(results)})
 
 
 @login_required
 def delete_reply(request, reply_id):
     reply = get_object_or_404(Reply, id=reply_id, post__author=request.user)
-    reply.deleted = True
-    reply.save()
+    soft_delete_replies(Reply.objects.filter(pk=reply.pk))
     return redirect('my_replies')
 
 
+@method_decorator(cache_anonymous("ranking", "categories"), name="dispatch")
 class PostRankingView(ListView):
-    model = Post
+    model = PostRank
     template_name = "board/post_ranking.html"
     context_object_name = "posts"
+    paginate_by = 20
+
+    SORTS = {"hot": "-hot_score", "top": "-score"}
+
+    def get_sort(self):
+        sort = self.request.GET.get("sort")
+        return sort if sort in self.SORTS else "hot"
 
     def get_queryset(self):
-        return Post.objects.filter(published=True).annotate(
-            num_replies=Count("replies")
-        ).order_by("-num_replies")
+        posts = PostRank.objects.filter(published=True)
+        category = self.request.GET.get("category")
+        if category and category.isdigit():
+            posts = posts.filter(category_id=category)
+        return posts
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_paginate(
+            queryset, self.request.GET.get("cursor"), per_page=page_size,
+            ordering=(self.SORTS[self.get_sort()], "-pk"),
+        )
+        return None, page, page.object_list, page.has_next()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["sort"] = self.get_sort()
+        context["category"] = self.request.GET.get("category", "")
+        context["categories"] = Category.objects.order_by("title")
+        return context
 
 
 @login_required
@@ -275,15 +568,69 @@ def my_posts_view(request):
 
 @login_required
 def notifications_view(request):
-    notifications = request.user.notifications.all()
+    notifications = keyset_paginate(
+        request.user.notifications.all(), request.GET.get("cursor"), per_page=20, ordering=INBOX_ORDERING
+    )
     return render(request, "board/notifications.html", {"notifications": notifications})
 
 
+@require_POST
+@login_required
+def mark_notifications_read(request):
+    form = NotificationMarkReadForm(request.POST)
+    if not form.is_valid():
+        # иначе неразобранный before молча расширил бы отметку до всех уведомлений
+        return HttpResponseBadRequest("Invalid before")
+    ids = [i for i in request.POST.getlist("ids") if i.isdigit()]
+    notifications = bulk_selection(
+        request.user, mark_all=form.cleaned_data["all"], ids=ids, before=form.cleaned_data["before"],
+    )
+    updated = mark_read(request.user, notifications) if notifications is not None else 0
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse({"updated": updated, "unread": unread_count(request.user.pk, fresh=True)})
+    return redirect("notifications")
+
+
+async def notifications_stream(request):
+    """
+    Server-Sent Events: новые уведомления и отклики без перезагрузки.
+    Соединение держит только корутину и очередь, поэтому нужен ASGI-сервер.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden()
+    if not hasattr(request, "scope"):
+        # под WSGI поток не стримится; 204 говорит EventSource не переподключаться
+        return HttpResponse(status=204)
+
+    broker = get_broker()
+    queue = broker.subscribe(user.pk)
+    heartbeat = getattr(settings, "PUSH_HEARTBEAT_SECONDS", 25)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # не даём прокси закрыть простаивающее соединение
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            broker.unsubscribe(user.pk, queue)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def mark_notification_read(request, pk):
-    notif = get_object_or_404(Notification, pk=pk, user=request.user)
-    notif.read = True
-    notif.save()
+    get_object_or_404(Notification, pk=pk, user=request.user)
+    mark_read(request.user, Notification.objects.filter(pk=pk))
     return redirect("notifications")
 
 
@@ -292,9 +639,10 @@ def send_newsletter(request, pk):
     if not request.user.is_superuser:
         return HttpResponseForbidden()
     newsletter = get_object_or_404(Newsletter, pk=pk)
-    users = User.objects.exclude(email="").values_list("email", flat=True)
-    messages = [(newsletter.subject, newsletter.body, settings.DEFAULT_FROM_EMAIL, [u]) for u in users]
-    send_mass_mail(messages, fail_silently=True)
-    newsletter.sent = True
-    newsletter.save()
+    if newsletter.sent or newsletter.deliveries.filter(status=OUTBOX_SENDING).exists():
+        # повторная задача разослала бы тем, чья доставка ещё не подтверждена
+        messages.warning(request, f"Рассылка «{newsletter}» уже отправлена или отправляется")
+        return redirect("admin:board_newsletter_changelist")
+    # отправка идёт в воркере, с журналом доставки по каждому получателю
+    send_newsletter_task.delay(newsletter.pk)
     return redirect("admin:board_newsletter_changelist")
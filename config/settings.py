@@ -78,6 +78,7 @@ INSTALLED_APPS += [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'board.db.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -118,13 +119,58 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#####
+# database
+#####
+
+# по умолчанию SQLite; для PostgreSQL: DB_ENGINE=django.db.backends.postgresql, DB_NAME, DB_USER, ...
+DB_ENGINE = os.getenv("DB_ENGINE", "django.db.backends.sqlite3")
+# постоянные соединения: сколько секунд держать соединение между запросами
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+# пул соединений psycopg 3 (Django 5.1+); с пулом CONN_MAX_AGE должен быть 0
+DB_POOL = os.getenv("DB_POOL", "False").lower() in ("true", "1", "yes")
+
+
+def database(name, host=None):
+    config = {
+        'ENGINE': DB_ENGINE,
+        'NAME': name,
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        # проверка постоянного соединения перед первым запросом
+        'CONN_HEALTH_CHECKS': True,
     }
+    if DB_ENGINE != 'django.db.backends.sqlite3':
+        config.update({
+            'USER': os.getenv("DB_USER", ""),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': host or os.getenv("DB_HOST", ""),
+            'PORT': os.getenv("DB_PORT", ""),
+        })
+        if DB_POOL:
+            config['OPTIONS'] = {'pool': True}
+    return config
+
+
+DATABASES = {
+    'default': database(os.getenv("DB_NAME") or BASE_DIR / 'db.sqlite3'),
 }
 
+# реплика для чтения: DB_REPLICA_HOST (тот же DB_NAME) или, для SQLite, отдельный файл DB_REPLICA_NAME.
+# Файл SQLite ничем не реплицируется и migrate его не трогает: после каждого migrate копируйте
+# primary целиком (cp db.sqlite3 "$DB_REPLICA_NAME"), иначе чтения падают с "no such table"
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_NAME = os.getenv("DB_REPLICA_NAME")
+if DB_REPLICA_HOST or DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **database(DB_REPLICA_NAME or DATABASES['default']['NAME'], host=DB_REPLICA_HOST),
+        # в тестах реплика смотрит в тестовую БД default
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['board.db.ReplicaRouter']
+# после записи пользователь столько секунд читает с primary (board.db.ReplicaMiddleware)
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "15"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -217,6 +263,8 @@ CKEDITOR_CONFIGS = {
 # Email backend
 #####
 
+# для локальной отладки: python -m aiosmtpd -n -l localhost:1025 и EMAIL_HOST=localhost, EMAIL_PORT=1025
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT"))
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
@@ -226,6 +274,10 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 ADMINS = os.getenv("ADMINS")
 SERVER_EMAIL = os.getenv("SERVER_EMAIL")
 
+# outbox: письма пишутся в БД и отправляются Celery-воркером пачками
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+
 #####
 # django-allauth
 #####
@@ -273,6 +325,48 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+#####
+# cache
+#####
+
+# Redis нужен, чтобы счётчики и кэш были общими для веб-процессов и воркеров
+REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL")
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
+    }
+elif os.getenv("FILE_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("FILE_CACHE_DIR"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# страницы для анонимов (board.cache); правки сбрасывают их раньше через поколения
+PAGE_CACHE_TTL = 600
+
+# счётчик непрочитанных сдвигают и веб-процессы, и воркеры Celery: долго держать его можно
+# только в общем кэше, иначе бейдж в каждом процессе устаревает не дольше чем на минуту
+UNREAD_NOTIFICATIONS_TTL = 24 * 3600 if REDIS_CACHE_URL else 60
+
+# прочитанные уведомления старше N дней удаляются задачей purge_old_notifications
+NOTIFICATIONS_RETENTION_DAYS = 90
+NOTIFICATIONS_PURGE_BATCH_SIZE = 1000
+
+# push-канал (board.push): без Redis события ходят только внутри одного процесса
+PUSH_REDIS_URL = os.getenv("PUSH_REDIS_URL")
+PUSH_HEARTBEAT_SECONDS = 25
+
 #####
 # celery+redis
 #####
@@ -283,11 +377,76 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
+# постановка задачи из запроса не ждёт переподключения к брокеру (retry=False в board.outbox, board.fanout);
+# воркер переподключается по своим broker_connection_* настройкам
+CELERY_BROKER_TRANSPORT_OPTIONS = {'max_retries': 0}
+
+# размер пачки получателей еженедельной рассылки (одна Celery-задача на пачку)
+NEWSLETTER_CHUNK_SIZE = 500
+
+# пачка подписчиков категории при рассылке о новом посте (board.fanout)
+FANOUT_CHUNK_SIZE = 500
 
 CELERY_BEAT_SCHEDULE = {
     'send-newsletter-every-monday-9am': {
         'task': 'appointment.tasks.send_weekly_newsletter',
         'schedule': crontab(hour=9, minute=0, day_of_week=1),
     },
+    'drain-outbox-every-minute': {
+        'task': 'appointment.tasks.drain_outbox',
+        'schedule': crontab(minute='*'),
+    },
+    'reconcile-unread-notifications-hourly': {
+        'task': 'appointment.tasks.reconcile_unread_notifications',
+        'schedule': crontab(minute=30),
+    },
+    'purge-old-notifications-nightly': {
+        'task': 'appointment.tasks.purge_old_notifications',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'decay-post-ranking-every-15-minutes': {
+        'task': 'appointment.tasks.decay_post_ranking',
+        'schedule': crontab(minute='*/15'),
+    },
+    'update-reputation-every-15-minutes': {
+        'task': 'appointment.tasks.update_reputation',
+        'schedule': crontab(minute='5-59/15'),
+    },
+    'recompute-reputation-weekly': {
+        'task': 'appointment.tasks.recompute_reputation',
+        'schedule': crontab(hour=4, minute=0, day_of_week=0),
+    },
+    'send-hourly-notification-digests': {
+        'task': 'appointment.tasks.send_notification_digests',
+        'schedule': crontab(minute=0),
+        'args': ('hourly',),
+    },
+    'send-daily-notification-digests': {
+        'task': 'appointment.tasks.send_notification_digests',
+        'schedule': crontab(hour=8, minute=0),
+        'args': ('daily',),
+    },
+}
+
+#####
+# ranking
+#####
+
+RANKING = {
+    "post_weight": 1.0,
+    "reply_weight": 1.0,
+    "accept_weight": 3.0,
+    "half_life_hours": 24.0,
+}
+
+#####
+# reputation
+#####
+
+REPUTATION = {
+    "reply_weight": 1.0,
+    "accept_weight": 10.0,
+    "engagement_weight": 2.0,
+    "half_life_days": 90.0,
 }
 
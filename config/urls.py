@@ -11,6 +11,9 @@ router = routers.DefaultRouter()
 router.register("categories", views.CategoryViewSet)
 router.register("posts", views.PostViewSet, basename="post")
 router.register("replies", views.ReplyViewSet)
+router.register("ranking", views.RankingViewSet, basename="ranking")
+router.register("notifications", views.NotificationViewSet, basename="notification")
+router.register("subscriptions", views.SubscriptionViewSet, basename="subscription")
 
 urlpatterns = [
     # ==== API ====
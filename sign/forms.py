@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.models import User
 
+from board.models import NewsletterSubscription
+
 
 class ProfileEditForm(forms.ModelForm):
     class Meta:
@@ -17,3 +19,15 @@ class ProfileEditForm(forms.ModelForm):
         }
 
 
+class NotificationSettingsForm(forms.ModelForm):
+    class Meta:
+        model = NewsletterSubscription
+        fields = ["digest", "subscribed"]
+        labels = {
+            "digest": "Письма об откликах и новых постах",
+            "subscribed": "Еженедельная рассылка",
+        }
+        widgets = {
+            "digest": forms.Select(attrs={"class": "form-select"}),
+            "subscribed": forms.CheckboxInput(attrs={"class": "form-check-input"}),
+        }
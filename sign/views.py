@@ -3,13 +3,13 @@ from allauth.account.views import EmailVerificationSentView as AllauthEmailVerif
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView
 
-from board.models import Post, Reply, Author
-from .forms import ProfileEditForm
+from board import stats
+from board.models import Author, NewsletterSubscription
+from .forms import NotificationSettingsForm, ProfileEditForm
 
 
 class CustomConfirmEmailView(ConfirmEmailView):
@@ -28,16 +28,24 @@ def profile_view(request):
 
 @login_required
 def edit_profile(request):
+    # без строки подписки пользователь не получает еженедельную рассылку
+    subscription = (
+        NewsletterSubscription.objects.filter(user=request.user).first()
+        or NewsletterSubscription(user=request.user, subscribed=False)
+    )
     if request.method == "POST":
         form = ProfileEditForm(request.POST, instance=request.user)
-        if form.is_valid():
+        settings_form = NotificationSettingsForm(request.POST, instance=subscription, prefix="notifications")
+        if form.is_valid() and settings_form.is_valid():
             form.save()
-            messages.success(request, "Имя успешно обновлено ✅")
+            settings_form.save()
+            messages.success(request, "Профиль успешно обновлён ✅")
             return redirect("profile")
     else:
         form = ProfileEditForm(instance=request.user)
+        settings_form = NotificationSettingsForm(instance=subscription, prefix="notifications")
 
-    return render(request, "sign/edit_profile.html", {"form": form})
+    return render(request, "sign/edit_profile.html", {"form": form, "settings_form": settings_form})
 
 
 class EmailVerificationSentView(AllauthEmailVerificationSentView):
@@ -49,32 +57,16 @@ class EmailConfirmView(TemplateView):
 
 
 def author_card_view(request, user_id):
-    user = get_object_or_404(User, pk=user_id)
-    author_card, created = Author.objects.get_or_create(user=user)
-
-    # Статистика
-    posts_count = Post.objects.filter(author=user).count()
-    replies_count = Reply.objects.filter(author=user).count()
-    accepted_replies = Reply.objects.filter(post__author=user, accepted=True).count()
-
-    # Последний пост
-    last_post = Post.objects.filter(author=user).order_by("-created_at").first()
-
-    # Топ категорий
-    top_categories = (
-        Post.objects.filter(author=user)
-        .values("category__title")
-        .annotate(cnt=Count("id"))
-        .order_by("-cnt")[:5]
-    )
+    # одна выборка по PK: пользователь + профиль + материализованная статистика
+    user = get_object_or_404(User.objects.select_related("author", "stats"), pk=user_id)
+    try:
+        author_card = user.author
+    except Author.DoesNotExist:
+        author_card = Author.objects.create(user=user)
 
     context = {
         "author": user,
         "card": author_card,
-        "posts_count": posts_count,
-        "replies_count": replies_count,
-        "accepted_replies": accepted_replies,
-        "last_post": last_post,
-        "top_categories": top_categories,
+        "stats": stats.for_user(user),
     }
     return render(request, "account/author_card.html", context)
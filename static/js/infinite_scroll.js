@@ -14,7 +14,7 @@
     const $list = $('#post-list');
     if (!$list.length) return;
 
-    let page = parseInt($list.data('page')) || 1;
+    let cursor = $list.data('next') || null;
     let hasNext = $list.data('has-next') === 1 || $list.data('has-next') === '1';
     let loading = false;
 
@@ -22,12 +22,11 @@
         if (loading || !hasNext) return;
         loading = true;
 
-        const requested = page + 1;
-        console.log('[infinite] requesting page', requested);
+        console.log('[infinite] requesting cursor', cursor);
 
         $.ajax({
             url: window.location.pathname,
-            data: { page: requested },
+            data: { cursor: cursor },
             method: 'GET',
             dataType: 'json',
             success: function (data) {
@@ -40,12 +39,8 @@
                 if (data.html && data.html.trim().length) {
                     $list.append(data.html);
                 }
-                if (typeof data.page !== 'undefined') {
-                    page = parseInt(data.page) || page;
-                } else {
-                    page = requested;
-                }
-                hasNext = !!data.has_next;
+                cursor = data.next || null;
+                hasNext = !!data.has_next && !!cursor;
                 if (!hasNext) {
                     $(window).off('scroll.infinite');
                     console.log('[infinite] no more pages');
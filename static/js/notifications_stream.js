@@ -0,0 +1,36 @@
+(function () {
+    const badge = document.getElementById('notifications-badge');
+    if (!badge || !window.EventSource) return;
+
+    function setUnread(count) {
+        count = Math.max(count, 0);
+        badge.textContent = count;
+        badge.classList.toggle('d-none', count === 0);
+    }
+
+    function unread() {
+        return parseInt(badge.textContent, 10) || 0;
+    }
+
+    const source = new EventSource(badge.dataset.stream);
+
+    source.addEventListener('notification', function () {
+        setUnread(unread() + 1);
+    });
+
+    source.addEventListener('read', function (e) {
+        setUnread(unread() - JSON.parse(e.data).updated);
+    });
+
+    source.addEventListener('reply', function (e) {
+        const data = JSON.parse(e.data);
+        const replies = document.getElementById('replies');
+        if (!replies || !window.location.pathname.startsWith('/posts/' + data.post + '/')) return;
+        if (document.getElementById('new-replies-alert')) return;
+        const alert = document.createElement('div');
+        alert.id = 'new-replies-alert';
+        alert.className = 'alert alert-info';
+        alert.innerHTML = 'Появились новые отклики. <a href="#replies" onclick="location.reload()">Обновить</a>';
+        replies.prepend(alert);
+    });
+})();